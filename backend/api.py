@@ -1,19 +1,61 @@
 import os
-import re
 import json
+import asyncio
+import hashlib
+import importlib.util
+import time
 import tempfile
 import logging
-from urllib.request import Request, urlopen
-from urllib.error import URLError
 from typing import Optional
 from datetime import datetime
 
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Header, Request as FastAPIRequest
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
 import uvicorn
 
+try:
+    from .audio import upload_suffix
+    from .batch import dedupe_urls
+    from .cache import DossierCache, TRANSCRIPTS, content_key
+    from .case_store import CaseStore
+    from .coalesce import RequestCoalescer
+    from .chunking import estimate_tokens
+    from .dossier import generate_dossier, generate_dossier_from_stream, render_markdown
+    from .fingerprint import ChunkIndex
+    from .jobs import Job, JobManager, JobQueueFull
+    from .model_selection import DEFAULT_MODEL, ModelSelector, configured_models
+    from . import metrics
+    from .normalize import NORMALIZE_VERSION, TranscriptNormalizer, normalize_transcript
+    from .ollama_client import OllamaError, parse_keep_alive
+    from .ollama_router import OllamaRouter, parse_base_urls
+    from .scheduler import BATCH, INTERACTIVE, OllamaScheduler, SchedulerFull, scheduling
+    from .transcripts import TranscriptProvider, TranscriptUnavailable, extract_video_id
+    from .whisper_pool import WhisperModelPool
+    from .whisper_segments import SegmentedTranscriber
+except ImportError:
+    from audio import upload_suffix
+    from batch import dedupe_urls
+    from cache import DossierCache, TRANSCRIPTS, content_key
+    from case_store import CaseStore
+    from coalesce import RequestCoalescer
+    from chunking import estimate_tokens
+    from dossier import generate_dossier, generate_dossier_from_stream, render_markdown
+    from fingerprint import ChunkIndex
+    from jobs import Job, JobManager, JobQueueFull
+    from model_selection import DEFAULT_MODEL, ModelSelector, configured_models
+    import metrics
+    from normalize import NORMALIZE_VERSION, TranscriptNormalizer, normalize_transcript
+    from ollama_client import OllamaError, parse_keep_alive
+    from ollama_router import OllamaRouter, parse_base_urls
+    from scheduler import BATCH, INTERACTIVE, OllamaScheduler, SchedulerFull, scheduling
+    from transcripts import TranscriptProvider, TranscriptUnavailable, extract_video_id
+    from whisper_pool import WhisperModelPool
+    from whisper_segments import SegmentedTranscriber
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,16 +64,139 @@ logger = logging.getLogger(__name__)
 # CONFIG FROM ENV
 # ============================================================================
 API_TOKEN = os.environ.get("API_TOKEN", "dev-token")
+API_TOKENS = os.environ.get("API_TOKENS", "")  # extra "tenant:token" pairs, comma-separated; each is its own tenant
+TENANT_HEADER = os.environ.get("TENANT_HEADER", "").lower()  # per-user header set by a trusted reverse proxy
+TRUSTED_PROXIES = {ip.strip() for ip in os.environ.get("TRUSTED_PROXIES", "").split(",") if ip.strip()}
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
-OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "mistral:latest")
+OLLAMA_BASE_URLS = parse_base_urls(os.environ.get("OLLAMA_BASE_URLS", OLLAMA_BASE_URL))  # comma-separated backends
+OLLAMA_MODELS = configured_models()  # same resolution as the CLI
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", DEFAULT_MODEL)
+OLLAMA_MAP_MODEL = OLLAMA_MODELS["map"]  # chunk summaries
+OLLAMA_REDUCE_MODEL = OLLAMA_MODELS["reduce"]  # reduce + final synthesis
+OLLAMA_FALLBACK_MODEL = OLLAMA_MODELS["fallback"]  # smallest model, used when overloaded
+MODEL_SHORT_TOKENS = int(os.environ.get("MODEL_SHORT_TOKENS", 5000))  # transcripts up to this use the reduce model throughout
+MODEL_OVERLOAD = float(os.environ.get("MODEL_OVERLOAD", 2.0))  # scheduler work per slot that steps models down; 0 = never
 WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base")
 CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "*").split(",")
 MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 200 * 1024 * 1024))  # 200MB
+OLLAMA_CONCURRENCY = int(os.environ.get("OLLAMA_CONCURRENCY", 4))  # parallel chunk summaries per dossier
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 2500))  # estimated tokens per chunk prompt
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", 100))
+REDUCE_TOKEN_BUDGET = int(os.environ.get("REDUCE_TOKEN_BUDGET", 6000))  # max notes size in the final prompt
+REDUCE_FAN_IN = int(os.environ.get("REDUCE_FAN_IN", 4))  # notes merged per reduce call
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", 600))
+OLLAMA_RETRIES = int(os.environ.get("OLLAMA_RETRIES", 2))
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", 16))  # per backend
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", 10))  # seconds between /api/tags probes
+OLLAMA_EJECT_SECONDS = float(os.environ.get("OLLAMA_EJECT_SECONDS", 30))  # how long a failing backend is skipped
+OLLAMA_MAX_INFLIGHT = int(os.environ.get("OLLAMA_MAX_INFLIGHT", 8))  # Ollama calls running at once, all requests
+OLLAMA_TENANT_REQUESTS = int(os.environ.get("OLLAMA_TENANT_REQUESTS", 8))  # /dossier and /dossier/stream requests one tenant may have in progress before 429
+OLLAMA_KEEP_ALIVE = parse_keep_alive(os.environ.get("OLLAMA_KEEP_ALIVE", "30m"))  # how long Ollama keeps the model loaded; -1 = forever
+OLLAMA_WARMUP = os.environ.get("OLLAMA_WARMUP", "true").lower() in ("1", "true", "yes")
+CACHE_ENABLED = os.environ.get("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_PATH = os.environ.get("CACHE_PATH", ".cache/dossier_cache.sqlite3")
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 7 * 24 * 3600))  # seconds
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 512 * 1024 * 1024))
+TRANSCRIPT_WORKERS = int(os.environ.get("TRANSCRIPT_WORKERS", 8))  # YouTube transcript fetches at once
+TRANSCRIPT_TIMEOUT = float(os.environ.get("TRANSCRIPT_TIMEOUT", 20))  # seconds per fetch
+TRANSCRIPT_MISS_TTL = float(os.environ.get("TRANSCRIPT_MISS_TTL", 6 * 3600))  # how long "no captions" is remembered
+TRANSCRIPT_NORMALIZE = os.environ.get("TRANSCRIPT_NORMALIZE", "true").lower() in ("1", "true", "yes")  # drop caption noise and repeats
+NEAR_DUP_ENABLED = os.environ.get("NEAR_DUP_ENABLED", "true").lower() in ("1", "true", "yes")
+NEAR_DUP_SIMILARITY = float(os.environ.get("NEAR_DUP_SIMILARITY", 0.85))  # estimated Jaccard to reuse a chunk summary
+NEAR_DUP_PATH = os.environ.get("NEAR_DUP_PATH", ".cache/chunk_index.json")
+NEAR_DUP_MAX_CHUNKS = int(os.environ.get("NEAR_DUP_MAX_CHUNKS", 100000))
+NEAR_DUP_SNAPSHOT_SECONDS = float(os.environ.get("NEAR_DUP_SNAPSHOT_SECONDS", 300))  # between index snapshots
+CASES_ENABLED = os.environ.get("CASES_ENABLED", "true").lower() in ("1", "true", "yes")
+CASES_PATH = os.environ.get("CASES_PATH", ".cache/cases.sqlite3")
+WHISPER_PRELOAD = os.environ.get("WHISPER_PRELOAD", "false").lower() in ("1", "true", "yes")
+WHISPER_MAX_MODELS = int(os.environ.get("WHISPER_MAX_MODELS", 1))
+WHISPER_CONCURRENCY = int(os.environ.get("WHISPER_CONCURRENCY", 1))
+WHISPER_WORKERS = int(os.environ.get("WHISPER_WORKERS", 0))  # segment processes; 0 = auto (half the cores, 1 on GPU)
+WHISPER_SEGMENT_SECONDS = float(os.environ.get("WHISPER_SEGMENT_SECONDS", 300))  # audio per segment, cut at silence
+AUDIO_MIN_SILENCE = float(os.environ.get("AUDIO_MIN_SILENCE", 1.0))  # pauses longer than this are shortened; 0 = off
+AUDIO_KEEP_SILENCE = float(os.environ.get("AUDIO_KEEP_SILENCE", 0.3))  # seconds left of each shortened pause
+AUDIO_SILENCE_DB = float(os.environ.get("AUDIO_SILENCE_DB", -40))  # below this level (dBFS) counts as silence
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))  # dossiers processed at the same time
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 100))
+JOB_TTL = float(os.environ.get("JOB_TTL", 3600))  # seconds a finished job is kept
+
+# Loaded Whisper models are shared by every request in this process
+whisper_pool = WhisperModelPool(max_models=WHISPER_MAX_MODELS, max_concurrency=WHISPER_CONCURRENCY)
+
+# Long audio is cut at silences and the segments transcribed in parallel
+transcriber = SegmentedTranscriber(
+    whisper_pool,
+    workers=WHISPER_WORKERS,
+    segment_seconds=WHISPER_SEGMENT_SECONDS,
+    min_silence=AUDIO_MIN_SILENCE,
+    keep_silence=AUDIO_KEEP_SILENCE,
+    silence_db=AUDIO_SILENCE_DB,
+    models=(WHISPER_MODEL,),
+)
+
+# One pooled Ollama client per backend, shared by the whole process,
+# behind a scheduler that caps and prioritizes calls
+ollama = OllamaScheduler(
+    OllamaRouter(
+        OLLAMA_BASE_URLS,
+        timeout=OLLAMA_TIMEOUT,
+        retries=OLLAMA_RETRIES,
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        health_interval=OLLAMA_HEALTH_INTERVAL,
+        eject_seconds=OLLAMA_EJECT_SECONDS,
+    ),
+    max_concurrency=OLLAMA_MAX_INFLIGHT,
+    max_requests_per_tenant=OLLAMA_TENANT_REQUESTS,
+)
+
+# Map/reduce models, stepped down to smaller ones under load
+models = ModelSelector(
+    OLLAMA_MAP_MODEL,
+    OLLAMA_REDUCE_MODEL,
+    fallback_model=OLLAMA_FALLBACK_MODEL,
+    short_tokens=MODEL_SHORT_TOKENS,
+    overload=MODEL_OVERLOAD,
+)
+
+# Transcripts, chunk summaries and final dossiers, keyed by content
+cache = DossierCache(CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES) if CACHE_ENABLED else None
+
+# Fingerprints of summarized chunks: near-duplicates reuse the cached summary
+chunk_index = (
+    ChunkIndex(NEAR_DUP_PATH, threshold=NEAR_DUP_SIMILARITY, max_entries=NEAR_DUP_MAX_CHUNKS)
+    if NEAR_DUP_ENABLED and cache else None
+)
+
+# YouTube transcripts: bounded fetch pool, remembers videos without captions
+youtube = TranscriptProvider(
+    cache=cache, workers=TRANSCRIPT_WORKERS, timeout=TRANSCRIPT_TIMEOUT, miss_ttl=TRANSCRIPT_MISS_TTL
+)
+
+# Every generated dossier, searchable through /cases
+cases = CaseStore(CASES_PATH) if CASES_ENABLED else None
+
+# Background dossier jobs
+jobs = JobManager(workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, ttl=JOB_TTL)
+
+# Identical requests in flight share one pipeline run
+coalescer = RequestCoalescer()
 
 # ============================================================================
 # SECURITY & UTILS
 # ============================================================================
 
+def parse_api_tokens(value: str) -> dict:
+    """{token: tenant} for API_TOKEN ("default") and the "tenant:token" pairs of API_TOKENS."""
+    tokens = {API_TOKEN: "default"}
+    for pair in value.split(","):
+        tenant, _, token = pair.strip().partition(":")
+        if tenant and token:
+            tokens[token] = tenant
+    return tokens
+
+TOKEN_TENANTS = parse_api_tokens(API_TOKENS)
+
 def verify_token(authorization: Optional[str] = Header(None)) -> str:
     """Verify Bearer token."""
     if not authorization:
@@ -42,138 +207,342 @@ def verify_token(authorization: Optional[str] = Header(None)) -> str:
         raise HTTPException(status_code=401, detail="Invalid Authorization header format")
     
     token = parts[1]
-    if token != API_TOKEN:
+    if token not in TOKEN_TENANTS:
         raise HTTPException(status_code=401, detail="Invalid token")
     
     return token
 
+def tenant_id(request: FastAPIRequest, token: str) -> str:
+    """Tenant for scheduling: the TENANT_HEADER user when a trusted proxy sent it, else the token's tenant.
+
+    Nothing the client sets by itself is trusted: the header only counts
+    coming from one of TRUSTED_PROXIES.
+    """
+    if TENANT_HEADER and request.client and request.client.host in TRUSTED_PROXIES:
+        user = request.headers.get(TENANT_HEADER)
+        if user:
+            return f"user:{user}"
+    return TOKEN_TENANTS.get(token, "default")
+
 # ============================================================================
 # CORE LOGIC (from video2dossie_pro.py)
 # ============================================================================
 
-VIDEO_ID_RE = re.compile(r"(?:v=|\/)([0-9A-Za-z_-]{11})(?:\b|$)")
+async def iter_whisper_segments(audio_path: str, model_name: str = "base"):
+    """Yield Whisper segments ({"start", "end", "text"}) in order as they are transcribed."""
+    # Only look for the package: importing it (and torch) here would block the event loop
+    if importlib.util.find_spec("whisper") is None:
+        raise HTTPException(status_code=500, detail="Whisper not installed")
 
-def extract_video_id(url: str) -> str:
-    """Extract video_id from YouTube URL."""
-    m = VIDEO_ID_RE.search(url)
-    if not m:
-        raise ValueError("Could not extract video_id from link. Use standard YouTube URL.")
-    return m.group(1)
+    try:
+        async for segment in transcriber.iter_segments(audio_path, model_name):
+            yield segment
+    except Exception as e:
+        logger.error(f"Whisper error: {e}")
+        raise HTTPException(status_code=500, detail="Whisper transcription failed")
 
-def http_post_json(url: str, payload: dict, timeout: int = 300) -> dict:
-    """POST JSON to endpoint."""
-    data = json.dumps(payload).encode("utf-8")
-    req = Request(url, data=data, headers={"Content-Type": "application/json"})
-    with urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+async def whisper_pieces(audio_path: str, progress):
+    """Whisper output as transcript text, timed as the "whisper" stage."""
+    start = time.perf_counter()
+    chars = 0
+    async for segment in iter_whisper_segments(audio_path, WHISPER_MODEL):
+        chars += len(segment["text"]) + 1
+        progress("transcribing", audio_seconds=segment["end"])
+        yield segment["text"] + "\n"
+    metrics.record_stage("whisper", time.perf_counter() - start)
+    progress("transcript_ready", source="whisper", chars=chars)
+
+def record_normalization(video_id: str, report: dict) -> dict:
+    metrics.TRANSCRIPT_CHARS_REMOVED.inc(report["chars_saved"])
+    logger.info(
+        f"Normalized {video_id}: {report['chars_saved']} of {report['chars_before']} chars removed "
+        f"(~{report['tokens_saved']} tokens)"
+    )
+    return report
+
+async def normalized_transcript(video_id: str, transcript: str) -> tuple:
+    """(normalized transcript, report), cached by the raw text so a repeat request skips the pass."""
+    key = content_key("normalized", NORMALIZE_VERSION, OLLAMA_MAP_MODEL, transcript)
+    cached = cache.get(TRANSCRIPTS, key) if cache else None
+    if cached is not None:
+        entry = json.loads(cached)
+        return entry["transcript"], entry["report"]
+    with metrics.span("normalize"):
+        transcript, report = await asyncio.to_thread(normalize_transcript, transcript, OLLAMA_MAP_MODEL)
+    if cache:
+        cache.set(TRANSCRIPTS, key, json.dumps({"transcript": transcript, "report": report}, ensure_ascii=False))
+    return transcript, record_normalization(video_id, report)
 
-def ollama_generate(prompt: str, model: str, base_url: str) -> str:
-    """Call Ollama /api/generate endpoint."""
-    try:
-        out = http_post_json(f"{base_url.rstrip('/')}/api/generate", {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.2
-            }
-        }, timeout=600)
-        return (out.get("response") or "").strip()
-    except URLError as e:
-        logger.error(f"Ollama connection error: {e}")
-        raise HTTPException(status_code=503, detail="Ollama service unavailable")
-
-def chunk_text(text: str, max_chars: int = 9000) -> list:
-    """Split text into chunks."""
-    text = text.strip()
-    if len(text) <= max_chars:
-        return [text]
-    
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + max_chars)
-        # Try to break on sentence end
-        cut = text.rfind(".", start, end)
-        if cut == -1 or cut < start + int(max_chars * 0.6):
-            cut = end
-        else:
-            cut = cut + 1
-        chunks.append(text[start:cut].strip())
-        start = cut
-    
-    return [c for c in chunks if c]
+# ============================================================================
+# PIPELINE
+# ============================================================================
 
-def try_youtube_transcript(video_id: str) -> Optional[str]:
-    """Try to fetch official transcript from YouTube."""
-    try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-    except Exception:
-        logger.warning("youtube_transcript_api not installed")
-        return None
-    
-    langs = ["pt", "pt-BR", "pt-PT", "en"]
-    try:
-        t = YouTubeTranscriptApi.get_transcript(video_id, languages=langs)
-        return "\n".join([x["text"] for x in t]).strip()
-    except Exception as e:
-        logger.info(f"No transcript found for {video_id}: {e}")
-        return None
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
 
-def whisper_transcribe(audio_path: str, model_name: str = "base") -> str:
-    """Transcribe audio using Whisper."""
-    try:
-        import whisper
-    except Exception:
-        raise HTTPException(status_code=500, detail="Whisper not installed")
-    
+class UploadSizeLimit:
+    """ASGI middleware refusing request bodies over `max_bytes` with 413.
+
+    FastAPI parses the whole multipart body (spooling files to disk)
+    before the endpoint runs, so the limit has to be enforced here: a
+    declared Content-Length over the limit is refused before anything is
+    read, and a body without one is cut off as soon as it crosses it.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            return await self.reject(send)
+
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            if too_large:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Looks like a client disconnect to the body parser: it stops reading
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message):
+            if not too_large:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                # Whatever error the app made of the cut-off body, the client gets 413
+                await self.reject(send)
+
+        await self.app(scope, limited_receive, limited_send)
+
+    async def reject(self, send) -> None:
+        body = json.dumps({"detail": f"File too large. Max size: {MAX_UPLOAD_SIZE // (1024*1024)}MB"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+async def save_upload(audio: UploadFile) -> tuple:
+    """Copy an uploaded audio file to a temp file, returning (path, sha256).
+
+    By the time this runs Starlette has already spooled the upload (the
+    request body as a whole is capped by `UploadSizeLimit`); the copy is
+    read in fixed-size chunks and hashed on the way, so memory stays flat
+    whatever the file size. A file over MAX_UPLOAD_SIZE is refused with
+    413 and the partial copy removed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    # Name the file after its real container, not whatever the client claimed
+    chunk = await audio.read(UPLOAD_CHUNK_SIZE)
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=upload_suffix(chunk[:64], audio.filename))
     try:
-        model = whisper.load_model(model_name)
-        result = model.transcribe(audio_path)
-        return (result.get("text") or "").strip()
-    except Exception as e:
-        logger.error(f"Whisper error: {e}")
-        raise HTTPException(status_code=500, detail="Whisper transcription failed")
+        with tmp:
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Max size: {MAX_UPLOAD_SIZE // (1024*1024)}MB"
+                    )
+                digest.update(chunk)
+                tmp.write(chunk)
+                chunk = await audio.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        remove_file(tmp.name)
+        raise
+    return tmp.name, digest.hexdigest()
+
+def remove_file(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def to_http_error(e: Exception) -> HTTPException:
+    """Map pipeline exceptions to the HTTP error returned to clients."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, OllamaError):
+        return HTTPException(status_code=503, detail="Ollama service unavailable")
+    if isinstance(e, SchedulerFull):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, TranscriptUnavailable):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, ValueError):
+        logger.error(f"Validation error: {e}")
+        return HTTPException(status_code=400, detail=str(e))
+    logger.error(f"Unexpected error: {e}", exc_info=e)
+    return HTTPException(status_code=500, detail="Internal server error")
+
+async def run_pipeline(
+    url: str,
+    audio_path: Optional[str] = None,
+    audio_hash: Optional[str] = None,
+    progress=None,
+    on_token=None,
+    include_timings: bool = False,
+) -> dict:
+    """Transcript -> dossier for one video. Returns the /dossier response body.
+
+    `progress(stage, **counters)` is called as the pipeline moves on and
+    `on_token(text)` receives the final synthesis as it is generated.
+    With `include_timings`, meta carries the per-stage timing breakdown.
+    """
+    with metrics.collect_timings() as timings, metrics.span("total"):
+        result = await build_dossier_response(url, audio_path, audio_hash, progress, on_token)
+    if include_timings:
+        result["meta"]["timings"] = timings
+    return result
+
+def pipeline_key(url: str, audio_hash: Optional[str] = None) -> tuple:
+    """Requests with the same key produce the same dossier."""
+    return (extract_video_id(url), audio_hash, OLLAMA_MAP_MODEL, OLLAMA_REDUCE_MODEL)
+
+def without_timings(result: dict) -> dict:
+    meta = {k: v for k, v in result["meta"].items() if k != "timings"}
+    return {**result, "meta": meta}
+
+async def coalesced_pipeline(
+    url: str,
+    audio_path: Optional[str] = None,
+    audio_hash: Optional[str] = None,
+    progress=None,
+    include_timings: bool = False,
+) -> dict:
+    """`run_pipeline`, shared with any identical request already in flight.
+
+    The uploaded file is removed once no pipeline needs it any more.
+    """
+    started = False
 
-def generate_dossier(transcript: str, model: str, base_url: str) -> str:
-    """Generate dossier using Ollama."""
-    chunks = chunk_text(transcript, max_chars=9000)
-    
-    # First pass: summarize each chunk
-    chunk_summaries = []
-    for idx, c in enumerate(chunks, 1):
-        prompt = f"""Você é um analista investigativo. Resuma o TRECHO {idx}/{len(chunks)} abaixo em bullets curtos, mantendo fatos, nomes e números.
-TRECHO:
-{c}
-"""
-        s = ollama_generate(prompt, model=model, base_url=base_url)
-        chunk_summaries.append(s)
-    
-    # Second pass: final synthesis
-    joined = "\n\n".join([f"### Trecho {i}\n{chunk_summaries[i-1]}" for i in range(1, len(chunk_summaries) + 1)])
-    
-    final_prompt = f"""Você é um jornalista investigativo e analista de inteligência.
+    def work(shared_progress):
+        nonlocal started
+        started = True
+        return run_owned(shared_progress)
 
-Com base nas notas por trecho abaixo, gere um DOSSIÊ do conteúdo.
-IMPORTANTE:
-- Se algo não estiver explícito nas notas, diga "não confirmado".
-- Referências externas: sugira temas/fontes para checar (ex: "site do IBGE", "paper sobre X"), mas deixe claro que são sugestões de verificação.
-- Seja objetivo, estruturado e útil para tomada de decisão.
+    async def run_owned(shared_progress) -> dict:
+        try:
+            return await run_pipeline(url, audio_path, audio_hash, progress=shared_progress, include_timings=True)
+        finally:
+            remove_file(audio_path)
 
-NOTAS:
-{joined}
+    try:
+        result = await coalescer.run(pipeline_key(url, audio_hash), work, progress)
+    finally:
+        # Attached to another request's run: our copy of the upload is unused
+        if not started:
+            remove_file(audio_path)
+    return result if include_timings else without_timings(result)
+
+async def build_dossier_response(url: str, audio_path, audio_hash, progress, on_token) -> dict:
+    progress = progress or (lambda stage, **counters: None)
+
+    # 1. Extract video_id
+    video_id = extract_video_id(url)
+    logger.info(f"Processing video: {video_id}")
+
+    # 2. Try official transcript
+    progress("transcript")
+    with metrics.span("transcript"):
+        try:
+            transcript = await youtube.get(video_id)
+        except TranscriptUnavailable as e:
+            # Not a "no captions" answer: only an uploaded audio lets us go on without YouTube
+            if not audio_path:
+                raise
+            logger.warning(f"{e}; using the uploaded audio")
+            transcript = None
+    used_source = "youtube"
+
+    # 3. If no transcript and no audio, return 422
+    if not transcript and not audio_path:
+        raise HTTPException(
+            status_code=422,
+            detail="No official transcript found. Please upload an audio file (MP3, M4A, or WAV) and try again."
+        )
+
+    # 4. If no transcript but audio provided, use Whisper
+    result = None
+    selected = None
+    normalization = None
+    if not transcript and audio_path:
+        used_source = "whisper"
+        audio_key = f"audio:{WHISPER_MODEL}:{audio_hash}"
+        transcript = cache.get(TRANSCRIPTS, audio_key) if cache else None
+        if not transcript:
+            # Chunks are summarized while Whisper is still transcribing
+            progress("transcribing")
+            logger.info("Transcribing with Whisper and generating dossier with Ollama...")
+            # Length unknown until Whisper is done: treat it as long
+            selected = models.select(None, ollama.load())
+            pieces = whisper_pieces(audio_path, progress)
+            normalizer = TranscriptNormalizer() if TRANSCRIPT_NORMALIZE else None
+            transcript, result = await generate_dossier_from_stream(
+                normalizer.wrap(pieces) if normalizer else pieces, model=selected["map"], client=ollama,
+                concurrency=OLLAMA_CONCURRENCY, cache=cache, progress=progress, on_token=on_token,
+                token_budget=REDUCE_TOKEN_BUDGET, fan_in=REDUCE_FAN_IN,
+                chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                reduce_model=selected["reduce"], index=chunk_index,
+            )
+            logger.info(f"Transcribed {len(transcript)} chars with Whisper")
+            if normalizer:
+                normalization = record_normalization(video_id, normalizer.report(selected["map"]))
+            if transcript and cache:
+                cache.set(TRANSCRIPTS, audio_key, transcript)
+
+    # 5. Generate dossier
+    if result is None:
+        progress("transcript_ready", source=used_source, chars=len(transcript))
+        if TRANSCRIPT_NORMALIZE:
+            # Caption noise and rolling repeats would only cost Ollama time
+            transcript, normalization = await normalized_transcript(video_id, transcript)
+        logger.info("Generating dossier with Ollama...")
+        selected = models.select(estimate_tokens(transcript, OLLAMA_MAP_MODEL), ollama.load())
+        result = await generate_dossier(
+            transcript, model=selected["map"], client=ollama, concurrency=OLLAMA_CONCURRENCY,
+            cache=cache, progress=progress, on_token=on_token,
+            token_budget=REDUCE_TOKEN_BUDGET, fan_in=REDUCE_FAN_IN,
+            chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+            reduce_model=selected["reduce"], index=chunk_index,
+        )
+
+    # 6. Build markdown response
+    markdown = render_markdown(url, video_id, result["dossier"], transcript)
+    meta = {
+        "video_id": video_id,
+        "used": used_source,
+        "generated_at": datetime.utcnow().isoformat(),
+        "model": selected["reduce"],
+        "models": selected,
+        "normalization": normalization,
+    }
 
-Gere exatamente com estas seções em Markdown:
+    # 7. Record the case
+    if cases:
+        try:
+            await asyncio.to_thread(
+                cases.save, video_id, url, transcript, result, source=used_source, model=selected["reduce"], meta=meta
+            )
+        except Exception as e:
+            logger.error(f"Saving case {video_id} failed: {e!r}")
 
-## 🧠 Resumo executivo (máx. 6 bullets)
-## 📌 Afirmações verificáveis (lista)
-## 🧍 Pessoas citadas (lista)
-## 🏢 Empresas/organizações citadas (lista)
-## 🧪 Vieses, exageros, lacunas (lista + 2 linhas explicando)
-## 📚 Pistas de checagem (fontes/termos para pesquisar)
-"""
-    dossier = ollama_generate(final_prompt, model=model, base_url=base_url)
-    return dossier
+    return {
+        "markdown": markdown,
+        "transcript": transcript,
+        "entities": result["entities"],
+        "claims": result["claims"],
+        "meta": meta,
+    }
 
 # ============================================================================
 # FASTAPI APP
@@ -200,6 +569,60 @@ app.add_middleware(
 # Trusted host middleware
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 
+# Refuse oversized uploads before the multipart body is read; the slack covers the form fields
+app.add_middleware(UploadSizeLimit, max_bytes=MAX_UPLOAD_SIZE + UPLOAD_CHUNK_SIZE)
+
+@app.on_event("startup")
+async def preload_whisper():
+    """Optionally load the Whisper model (in every segment worker) before the first request."""
+    if WHISPER_PRELOAD:
+        try:
+            await asyncio.to_thread(transcriber.preload)
+        except Exception as e:
+            logger.warning(f"Whisper preload failed: {e}")
+
+@app.on_event("startup")
+async def start_jobs():
+    await jobs.start()
+
+@app.on_event("startup")
+async def start_ollama_health():
+    ollama.start()
+
+async def warmup_models():
+    for model in dict.fromkeys([OLLAMA_REDUCE_MODEL, OLLAMA_MAP_MODEL]):
+        await ollama.warmup(model)
+
+@app.on_event("startup")
+async def warmup_ollama():
+    """Load the map and reduce models on every backend so the first request does not pay for it."""
+    if OLLAMA_WARMUP:
+        # In the background: a slow or absent Ollama must not hold up startup
+        app.state.ollama_warmup = asyncio.create_task(warmup_models())
+
+async def snapshot_chunk_index():
+    while True:
+        await asyncio.sleep(NEAR_DUP_SNAPSHOT_SECONDS)
+        try:
+            await asyncio.to_thread(chunk_index.save)
+        except Exception as e:
+            logger.warning(f"Chunk index snapshot failed: {e!r}")
+
+@app.on_event("startup")
+async def start_chunk_index_snapshots():
+    if chunk_index is not None:
+        app.state.chunk_index_snapshots = asyncio.create_task(snapshot_chunk_index())
+
+@app.on_event("shutdown")
+async def close_ollama():
+    await jobs.stop()
+    await ollama.aclose()
+    transcriber.shutdown()
+    youtube.shutdown()
+    if chunk_index is not None:
+        app.state.chunk_index_snapshots.cancel()
+        chunk_index.save()
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -211,6 +634,9 @@ async def health(request: FastAPIRequest):
         "status": "ok",
         "timestamp": datetime.utcnow().isoformat(),
         "ollama_model": OLLAMA_MODEL,
+        "ollama_models": {"map": OLLAMA_MAP_MODEL, "reduce": OLLAMA_REDUCE_MODEL, "fallback": OLLAMA_FALLBACK_MODEL},
+        "ollama_backends": ollama.status(),
+        "ollama_load": ollama.load(),
         "url_path": str(request.url.path),
         "root_path": request.scope.get("root_path", "none"),
     }
@@ -232,10 +658,17 @@ async def debug_headers(request: FastAPIRequest):
         }
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: per-stage and per-Ollama-call histograms."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/dossier")
 async def create_dossier(
+    request: FastAPIRequest,
     url: str = Form(...),
     audio: Optional[UploadFile] = File(None),
+    timings: bool = Form(False),
     token: str = Depends(verify_token),
 ):
     """
@@ -243,91 +676,242 @@ async def create_dossier(
     
     - **url**: YouTube URL (required)
     - **audio**: MP3/M4A/WAV file (optional)
+    - **timings**: add a per-stage timing breakdown to `meta` (optional)
     - **Authorization**: Bearer <token> (required header)
     
-    Returns JSON with markdown, transcript, and metadata.
+    Returns JSON with markdown, transcript, and metadata. Concurrent
+    requests for the same video (and audio) share one pipeline run.
     """
+    tenant = tenant_id(request, token)
     try:
-        # 1. Extract video_id
-        video_id = extract_video_id(url)
-        logger.info(f"Processing video: {video_id}")
-        
-        # 2. Try official transcript
-        transcript = try_youtube_transcript(video_id)
-        used_source = "youtube"
-        
-        # 3. If no transcript and no audio, return 422
-        if not transcript and not audio:
-            raise HTTPException(
-                status_code=422,
-                detail="No official transcript found. Please upload an audio file (MP3, M4A, or WAV) and try again."
-            )
-        
-        # 4. If no transcript but audio provided, use Whisper
-        if not transcript and audio:
-            # Check file size
-            contents = await audio.read()
-            if len(contents) > MAX_UPLOAD_SIZE:
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"File too large. Max size: {MAX_UPLOAD_SIZE // (1024*1024)}MB"
-                )
-            
-            # Save to temp file and transcribe
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                tmp.write(contents)
-                tmp_path = tmp.name
-            
-            try:
-                transcript = whisper_transcribe(tmp_path, model_name=WHISPER_MODEL)
-                used_source = "whisper"
-                logger.info(f"Transcribed {len(transcript)} chars with Whisper")
-            finally:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-        
-        # 5. Generate dossier
-        logger.info("Generating dossier with Ollama...")
-        dossier = generate_dossier(transcript, model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL)
-        
-        # 6. Build markdown response
-        markdown = f"""---
-type: video
-url: {url}
-video_id: {video_id}
-generated_at: {datetime.utcnow().isoformat()}
----
-
-# 🎥 Dossiê do vídeo
-
-{dossier}
-
----
-
-# 📝 Transcrição (bruta)
-
-{transcript}
-"""
-        
-        return {
-            "markdown": markdown,
-            "transcript": transcript,
-            "meta": {
-                "video_id": video_id,
-                "used": used_source,
-                "generated_at": datetime.utcnow().isoformat(),
-                "model": OLLAMA_MODEL,
-            }
-        }
-    
-    except HTTPException:
+        with ollama.admitted(tenant):
+            audio_path, audio_hash = await save_upload(audio) if audio else (None, None)
+            with scheduling(tenant, INTERACTIVE):
+                return await coalesced_pipeline(url, audio_path, audio_hash, include_timings=timings)
+    except Exception as e:
+        raise to_http_error(e)
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/dossier/stream")
+async def stream_dossier(
+    request: FastAPIRequest,
+    url: str = Form(...),
+    audio: Optional[UploadFile] = File(None),
+    timings: bool = Form(False),
+    token: str = Depends(verify_token),
+):
+    """
+    Same as `POST /dossier`, streamed as Server-Sent Events.
+
+    Emits `stage` events while the pipeline runs, `token` events with the
+    final dossier as Ollama writes it, then `done` with the full response
+    body (or `error` with status_code and detail).
+    """
+    tenant = tenant_id(request, token)
+    try:
+        release = ollama.admit(tenant)
+    except SchedulerFull as e:
+        raise to_http_error(e)
+    try:
+        audio_path, audio_hash = await save_upload(audio) if audio else (None, None)
+    except BaseException:
+        release()
         raise
+    events: asyncio.Queue = asyncio.Queue()
+
+    def progress(stage: str, **counters):
+        events.put_nowait(("stage", {"stage": stage, **counters}))
+
+    def on_token(text: str):
+        events.put_nowait(("token", {"text": text}))
+
+    async def run():
+        try:
+            with scheduling(tenant, INTERACTIVE):
+                result = await run_pipeline(
+                    url, audio_path, audio_hash, progress=progress, on_token=on_token, include_timings=timings
+                )
+            events.put_nowait(("done", result))
+        except Exception as e:
+            err = to_http_error(e)
+            events.put_nowait(("error", {"status_code": err.status_code, "detail": err.detail}))
+        finally:
+            remove_file(audio_path)
+            release()
+
+    async def stream():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event, data = await events.get()
+                yield sse_event(event, data)
+                if event in ("done", "error"):
+                    break
+        finally:
+            # Client went away: stop spending Ollama time on it
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also frees the slot if the client left before the stream started
+        background=BackgroundTask(release),
+    )
+
+def job_error(e: Exception) -> dict:
+    err = to_http_error(e)
+    return {"status_code": err.status_code, "detail": err.detail}
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    request: FastAPIRequest,
+    url: str = Form(...),
+    audio: Optional[UploadFile] = File(None),
+    timings: bool = Form(False),
+    token: str = Depends(verify_token),
+):
+    """
+    Queue a dossier job and return its id immediately.
+
+    Poll `GET /jobs/{job_id}` for progress and fetch the dossier from
+    `GET /jobs/{job_id}/result`. Returns 429 when the queue is full. A
+    job for the same video (and audio) that is still queued or running is
+    returned instead of queueing another one.
+    """
+    try:
+        extract_video_id(url)
     except ValueError as e:
-        logger.error(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
+
+    # No tenant request slot: queued jobs are bounded by JOB_QUEUE_SIZE, and
+    # their Ollama calls still take turns with other tenants' in the scheduler
+    tenant = tenant_id(request, token)
+    audio_path, audio_hash = await save_upload(audio) if audio else (None, None)
+    key = pipeline_key(url, audio_hash)
+
+    job = jobs.find(key)
+    if job is not None:
+        remove_file(audio_path)
+        metrics.COALESCED_REQUESTS.inc()
+        logger.info(f"Attached to job {job.id}")
+    else:
+        async def run(job: Job) -> dict:
+            with scheduling(tenant, INTERACTIVE):
+                return await coalesced_pipeline(
+                    url, audio_path, audio_hash, progress=job.update, include_timings=timings
+                )
+
+        try:
+            job = jobs.submit(run, on_error=job_error, key=key)
+        except JobQueueFull as e:
+            remove_file(audio_path)
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+        logger.info(f"Queued job {job.id} ({jobs.queued()} waiting)")
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result",
+    }
+
+class BatchRequest(BaseModel):
+    urls: list[str]
+
+@app.post("/dossier/batch", status_code=202)
+async def submit_batch(request: FastAPIRequest, body: BatchRequest, token: str = Depends(verify_token)):
+    """
+    Queue one dossier job per unique video in `urls`.
+
+    URLs are deduplicated by video_id and invalid ones are reported back.
+    The whole batch is rejected with 429 if the queue cannot take it. Its
+    Ollama calls run at batch priority, behind interactive requests; like
+    `POST /jobs`, the job queue bounds it, so it takes no per-tenant
+    request slots.
+    """
+    tenant = tenant_id(request, token)
+    videos = dedupe_urls(body.urls)
+    invalid = []
+    for url in body.urls:
+        try:
+            extract_video_id(url)
+        except ValueError:
+            invalid.append(url)
+
+    if len(videos) > jobs.capacity():
+        raise HTTPException(
+            status_code=429,
+            detail=f"Batch of {len(videos)} videos exceeds free queue capacity ({jobs.capacity()})",
+            headers={"Retry-After": "60"},
+        )
+    # Fetch every transcript now, in parallel, instead of as each job starts
+    youtube.prefetch([video_id for video_id, _ in videos])
+
+    def make_run(url: str):
+        async def run(job: Job) -> dict:
+            with scheduling(tenant, BATCH):
+                return await coalesced_pipeline(url, progress=job.update)
+        return run
+
+    queued = []
+    for video_id, url in videos:
+        key = pipeline_key(url)
+        job = jobs.find(key) or jobs.submit(make_run(url), on_error=job_error, key=key)
+        queued.append({"video_id": video_id, "url": url, "job_id": job.id, "status_url": f"/jobs/{job.id}"})
+
+    logger.info(f"Queued batch of {len(queued)} videos")
+    return {"jobs": queued, "invalid": invalid}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, token: str = Depends(verify_token)):
+    """Job status with the current pipeline stage and progress counters."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, token: str = Depends(verify_token)):
+    """Dossier of a finished job; 202 with the job status while it is still running."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error.get("status_code", 500), detail=job.error.get("detail"))
+    if job.status != "done":
+        return JSONResponse(status_code=202, content=job.to_dict())
+    return job.result
+
+def require_cases() -> CaseStore:
+    if cases is None:
+        raise HTTPException(status_code=404, detail="Case store is disabled (CASES_ENABLED=false)")
+    return cases
+
+@app.get("/cases")
+async def list_cases(limit: int = 50, offset: int = 0, token: str = Depends(verify_token)):
+    """Stored cases, most recent first, without transcripts."""
+    store = require_cases()
+    return await asyncio.to_thread(store.list, min(max(1, limit), 500), max(0, offset))
+
+@app.get("/cases/search")
+async def search_cases(q: str, limit: int = 20, token: str = Depends(verify_token)):
+    """Full-text search over transcripts, entities, claims and dossiers."""
+    store = require_cases()
+    results = await asyncio.to_thread(store.search, q, min(max(1, limit), 100))
+    return {"q": q, "results": results}
+
+@app.get("/cases/{video_id}")
+async def get_case(video_id: str, token: str = Depends(verify_token)):
+    """Everything stored for one video."""
+    store = require_cases()
+    case = await asyncio.to_thread(store.get, video_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return case
 
 # ============================================================================
 # MAIN
@@ -0,0 +1,197 @@
+import bisect
+import logging
+import os
+import subprocess
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # what Whisper expects
+FRAME_SECONDS = 0.03
+BLOCK_FRAMES = 4096  # frames per RMS block, so a memmap is never read whole
+
+# Container signatures: (offset, magic, suffix)
+_SIGNATURES = [
+    (0, b"ID3", ".mp3"),
+    (4, b"ftyp", ".m4a"),
+    (0, b"OggS", ".ogg"),
+    (0, b"fLaC", ".flac"),
+    (0, b"\x1a\x45\xdf\xa3", ".webm"),
+    (0, b"#!AMR", ".amr"),
+]
+KNOWN_SUFFIXES = {suffix for _, _, suffix in _SIGNATURES} | {".wav", ".aac", ".mp4", ".mkv", ".opus", ".wma"}
+
+
+def detect_format(head: bytes) -> Optional[str]:
+    """File suffix for the container in the first bytes of a file, or None."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return ".wav"
+    for offset, magic, suffix in _SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return suffix
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # Frame sync: MPEG audio has a non-zero layer, ADTS (raw AAC) has layer 0
+        return ".aac" if head[1] & 0x06 == 0 else ".mp3"
+    return None
+
+
+def upload_suffix(head: bytes, filename: Optional[str] = None) -> str:
+    """Suffix for a saved upload: the detected container, else a known extension of `filename`."""
+    suffix = detect_format(head)
+    if suffix:
+        return suffix
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext in KNOWN_SUFFIXES else ".bin"
+
+
+def decode_pcm(path: str, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any audio file to mono 16-bit PCM at `sr`, memory-mapped.
+
+    ffmpeg downmixes and resamples in one pass and writes to a temporary
+    file that is mapped rather than read, so an hour of audio does not sit
+    in the process heap (Whisper's own loader holds it twice: int16 and
+    float32).
+    """
+    fd, raw = tempfile.mkstemp(suffix=".pcm")
+    os.close(fd)
+    try:
+        subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-threads", "0", "-i", path,
+             "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-y", raw],
+            check=True, capture_output=True,
+        )
+        if os.path.getsize(raw) == 0:
+            return np.zeros(0, dtype=np.int16)
+        return np.memmap(raw, dtype=np.int16, mode="r")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg could not decode {path}: {e.stderr.decode(errors='replace').strip()}") from e
+    finally:
+        # The mapping stays valid after the unlink; the space is freed with it
+        os.remove(raw)
+
+
+def _temp_memmap(length: int, dtype) -> np.ndarray:
+    """A writable array of `length` items backed by an unlinked temporary file."""
+    fd, path = tempfile.mkstemp(suffix=".pcm")
+    os.close(fd)
+    try:
+        return np.memmap(path, dtype=dtype, mode="w+", shape=(length,))
+    finally:
+        # As in decode_pcm: the mapping outlives the name
+        os.remove(path)
+
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """int16 PCM as the float32 [-1, 1] array Whisper takes."""
+    return np.asarray(samples, dtype=np.float32) / 32768.0
+
+
+def frame_rms(audio: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """RMS of each FRAME_SECONDS frame, computed block by block."""
+    frame = int(FRAME_SECONDS * sr)
+    frames = len(audio) // frame
+    rms = np.empty(frames, dtype=np.float32)
+    for i in range(0, frames, BLOCK_FRAMES):
+        n = min(BLOCK_FRAMES, frames - i)
+        block = np.asarray(audio[i * frame:(i + n) * frame], dtype=np.float32).reshape(n, frame)
+        rms[i:i + n] = np.sqrt(np.mean(block ** 2, axis=1))
+    return rms
+
+
+class TimeMap:
+    """Maps times in silence-compressed audio back to the original file."""
+
+    def __init__(self, breakpoints: list):
+        # (compressed_start, original_start) of each kept stretch, in seconds
+        self.starts = [float(c) for c, _ in breakpoints] or [0.0]
+        self.offsets = [float(o - c) for c, o in breakpoints] or [0.0]
+
+    def to_original(self, t: float) -> float:
+        i = max(0, bisect.bisect_right(self.starts, t) - 1)
+        return round(float(t) + self.offsets[i], 2)
+
+
+class PreparedAudio:
+    def __init__(self, samples: np.ndarray, time_map: TimeMap, original_samples: int, sr: int = SAMPLE_RATE):
+        self.samples = samples
+        self.time_map = time_map
+        self.sr = sr
+        self.original_seconds = original_samples / sr
+        self.seconds = len(samples) / sr
+
+    @property
+    def removed_seconds(self) -> float:
+        return self.original_seconds - self.seconds
+
+
+def compress_silence(
+    audio: np.ndarray,
+    sr: int = SAMPLE_RATE,
+    min_silence: float = 1.0,
+    keep: float = 0.3,
+    threshold_db: float = -40.0,
+) -> tuple:
+    """Shorten every pause longer than `min_silence` seconds to `keep` seconds.
+
+    A frame is silent below `threshold_db` dBFS. Short pauses are left
+    alone (they carry sentence boundaries), and `keep` seconds of each long
+    one stay so Whisper still sees a break. Returns (samples, TimeMap);
+    without long pauses the input is returned as is. The kept stretches
+    are copied block by block into a memory-mapped temporary file, like
+    the decoded input, so neither is ever in the heap whole.
+    """
+    frame = int(FRAME_SECONDS * sr)
+    if min_silence <= 0 or len(audio) < frame:
+        return audio, TimeMap([(0.0, 0.0)])
+
+    silent = frame_rms(audio, sr) < 32768 * 10 ** (threshold_db / 20)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    min_frames = int(min_silence / FRAME_SECONDS)
+    keep_frames = int(keep / FRAME_SECONDS)
+
+    kept = []  # (start, end) sample ranges of the original
+    pos = 0
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < min_frames:
+            continue
+        cut_from = (start + keep_frames // 2) * frame
+        cut_to = (end - (keep_frames - keep_frames // 2)) * frame
+        if cut_to > cut_from:
+            kept.append((pos, cut_from))
+            pos = cut_to
+    if not kept:
+        return audio, TimeMap([(0.0, 0.0)])
+    kept.append((pos, len(audio)))
+
+    out = _temp_memmap(sum(end - start for start, end in kept), audio.dtype)
+    block = BLOCK_FRAMES * frame
+    breakpoints = []
+    offset = 0
+    for start, end in kept:
+        breakpoints.append((offset / sr, start / sr))
+        for i in range(start, end, block):
+            n = min(block, end - i)
+            out[offset:offset + n] = audio[i:i + n]
+            offset += n
+    return out, TimeMap(breakpoints)
+
+
+def prepare_audio(
+    path: str,
+    min_silence: float = 1.0,
+    keep_silence: float = 0.3,
+    silence_db: float = -40.0,
+) -> PreparedAudio:
+    """Decode `path` to 16 kHz mono PCM and compress its long silences."""
+    audio = decode_pcm(path)
+    samples, time_map = compress_silence(audio, min_silence=min_silence, keep=keep_silence, threshold_db=silence_db)
+    prepared = PreparedAudio(samples, time_map, len(audio))
+    if prepared.original_seconds:
+        logger.info(
+            f"Audio: {prepared.original_seconds:.0f}s decoded, {prepared.removed_seconds:.0f}s of silence removed "
+            f"({prepared.removed_seconds / prepared.original_seconds:.0%})"
+        )
+    return prepared
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+try:
+    from .dossier import generate_dossier, render_markdown
+    from .normalize import normalize_transcript
+    from .transcripts import TranscriptProvider, TranscriptUnavailable, extract_video_id
+except ImportError:
+    from dossier import generate_dossier, render_markdown
+    from normalize import normalize_transcript
+    from transcripts import TranscriptProvider, TranscriptUnavailable, extract_video_id
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "batch_manifest.json"
+
+
+def read_urls(lines: Iterable[str]) -> list:
+    """URLs from a list/file, skipping blank lines and # comments."""
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            urls.append(line)
+    return urls
+
+
+def dedupe_urls(urls: Iterable[str]) -> list:
+    """(video_id, url) pairs, first URL per video_id; invalid URLs are skipped."""
+    seen = {}
+    for url in urls:
+        try:
+            video_id = extract_video_id(url)
+        except ValueError:
+            logger.warning(f"Skipping invalid URL: {url}")
+            continue
+        seen.setdefault(video_id, url)
+    return list(seen.items())
+
+
+class BoundedClient:
+    """Ollama client wrapper sharing one concurrency limit across all videos."""
+
+    def __init__(self, client, limit: int):
+        self.client = client
+        self._sem = asyncio.Semaphore(max(1, limit))
+
+    async def generate(self, *args, **kwargs) -> str:
+        async with self._sem:
+            return await self.client.generate(*args, **kwargs)
+
+    async def generate_stream(self, *args, **kwargs):
+        async with self._sem:
+            async for token in self.client.generate_stream(*args, **kwargs):
+                yield token
+
+
+class BatchManifest:
+    """Per-video status persisted after every change, so a rerun resumes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_done(self, video_id: str, out_dir: str) -> bool:
+        entry = self.entries.get(video_id)
+        return bool(entry and entry["status"] == "done" and os.path.exists(os.path.join(out_dir, "dossie.md")))
+
+    def record(self, video_id: str, url: str, status: str, error: Optional[str] = None) -> None:
+        self.entries[video_id] = {
+            "url": url,
+            "status": status,
+            "error": error,
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+
+async def run_batch(
+    urls: Iterable[str],
+    client,
+    model: str,
+    out_root: str = "cases",
+    cache=None,
+    cases=None,
+    fetch_concurrency: int = 8,
+    video_concurrency: int = 2,
+    ollama_concurrency: int = 4,
+    normalize: bool = True,
+    **dossier_options,
+) -> dict:
+    """Generate dossiers for many videos, writing each to `out_root/<video_id>/`.
+
+    Transcripts are fetched up to `fetch_concurrency` at a time while at most
+    `video_concurrency` dossiers are generated at once, all sharing
+    `ollama_concurrency` Ollama calls. Progress is kept in
+    `out_root/batch_manifest.json`; videos already marked done are skipped.
+    With `normalize`, caption noise and repeats are stripped from each
+    transcript first (see `normalize_transcript`). With a `cases` store
+    each dossier is also recorded there.
+    Returns a count of videos per final status.
+    """
+    os.makedirs(out_root, exist_ok=True)
+    manifest = BatchManifest(os.path.join(out_root, MANIFEST_NAME))
+    bounded = BoundedClient(client, ollama_concurrency)
+    transcripts = TranscriptProvider(cache=cache, workers=fetch_concurrency)
+    video_sem = asyncio.Semaphore(max(1, video_concurrency))
+    counts = {"done": 0, "skipped": 0, "no_transcript": 0, "failed": 0}
+
+    async def process(video_id: str, url: str) -> None:
+        out_dir = os.path.join(out_root, video_id)
+        if manifest.is_done(video_id, out_dir):
+            counts["skipped"] += 1
+            return
+
+        try:
+            transcript = await transcripts.get(video_id)
+        except TranscriptUnavailable as e:
+            # Not "no captions": left as failed, so the next run of the batch tries again
+            logger.error(f"Batch: {video_id} failed: {e}")
+            manifest.record(video_id, url, "failed", error=str(e))
+            counts["failed"] += 1
+            return
+        if not transcript:
+            manifest.record(video_id, url, "no_transcript")
+            counts["no_transcript"] += 1
+            return
+        if normalize:
+            transcript, report = await asyncio.to_thread(normalize_transcript, transcript, model)
+            logger.info(f"Batch: {video_id} normalized, ~{report['tokens_saved']} tokens saved")
+
+        async with video_sem:
+            try:
+                result = await generate_dossier(
+                    transcript, model=model, client=bounded, cache=cache,
+                    concurrency=ollama_concurrency, **dossier_options,
+                )
+            except Exception as e:
+                logger.error(f"Batch: {video_id} failed: {e!r}")
+                manifest.record(video_id, url, "failed", error=str(e))
+                counts["failed"] += 1
+                return
+
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, "transcript.txt"), "w", encoding="utf-8") as f:
+            f.write(transcript)
+        with open(os.path.join(out_dir, "dossie.md"), "w", encoding="utf-8") as f:
+            f.write(render_markdown(url, video_id, result["dossier"], transcript))
+        with open(os.path.join(out_dir, "dossie.json"), "w", encoding="utf-8") as f:
+            json.dump({"entities": result["entities"], "claims": result["claims"]}, f, ensure_ascii=False, indent=2)
+        if cases:
+            # The model that wrote the dossier, as the API records it
+            reduce_model = dossier_options.get("reduce_model") or model
+            await asyncio.to_thread(
+                cases.save, video_id, url, transcript, result, source="youtube", model=reduce_model
+            )
+        manifest.record(video_id, url, "done")
+        counts["done"] += 1
+        logger.info(f"Batch: {video_id} done ({sum(counts.values())} processed)")
+
+    videos = dedupe_urls(urls)
+    logger.info(f"Batch: {len(videos)} unique videos")
+    try:
+        await asyncio.gather(*[process(video_id, url) for video_id, url in videos])
+    finally:
+        transcripts.shutdown()
+    return counts
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Cache layers
+TRANSCRIPTS = "transcript"
+CHUNK_SUMMARIES = "chunk"
+DOSSIERS = "dossier"
+
+
+def content_key(*parts: str) -> str:
+    """Stable sha256 key over the given parts.
+
+    Callers include the model name and the prompt template text, so changing
+    either produces new keys and old entries simply age out.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class DossierCache:
+    """Persistent SQLite key/value cache shared by all pipeline layers.
+
+    Entries expire after `ttl` seconds. When the stored values exceed
+    `max_bytes`, the least recently read entries are evicted first.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, ns: str, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM entries WHERE ns = ? AND key = ?", (ns, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._delete(ns, key)
+                return None
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE ns = ? AND key = ?", (now, ns, key)
+            )
+            return value
+
+    def set(self, ns: str, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._delete(ns, key)
+            self._db.execute(
+                "INSERT INTO entries (ns, key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (ns, key, value, size, now, now),
+            )
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict(now)
+
+    def _delete(self, ns: str, key: str) -> None:
+        row = self._db.execute("SELECT size FROM entries WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM entries WHERE ns = ? AND key = ?", (ns, key))
+            self._size -= row[0]
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then LRU entries until under 90% of max_bytes."""
+        self._db.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+        target = int(self.max_bytes * 0.9)
+        size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if size > target:
+            freed = 0
+            cutoff = None
+            for accessed_at, entry_size in self._db.execute(
+                "SELECT accessed_at, size FROM entries ORDER BY accessed_at"
+            ):
+                freed += entry_size
+                cutoff = accessed_at
+                if size - freed <= target:
+                    break
+            if cutoff is not None:
+                self._db.execute("DELETE FROM entries WHERE accessed_at <= ?", (cutoff,))
+            size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self._size = size
+        logger.info(f"Cache evicted down to {size} bytes")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
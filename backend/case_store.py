@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def fts_query(q: str) -> str:
+    """User search text as an FTS5 query: every word must match, as a prefix.
+
+    Each word is quoted so FTS5 operators and punctuation in `q` are taken
+    literally instead of raising a syntax error.
+    """
+    terms = []
+    for word in q.split():
+        word = word.replace('"', '""')
+        terms.append(f'"{word}"*')
+    return " ".join(terms)
+
+
+def _entity_text(entities: dict, claims: list) -> str:
+    names = [e["name"] for group in entities.values() for e in group]
+    return "\n".join(names + [c["text"] for c in claims])
+
+
+class CaseStore:
+    """Every generated dossier, kept for listing and full-text search.
+
+    One row per video (the latest run wins) with the transcript, chunk
+    summaries, dossier, entities, claims and metadata, plus an FTS5 index
+    over transcript, entities/claims and dossier text.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._columns("cases") and "id" not in self._columns("cases"):
+            self._migrate()
+        self._create_tables()
+
+    def _columns(self, table: str) -> list:
+        return [row[1] for row in self._db.execute(f"PRAGMA table_info({table})")]
+
+    def _create_tables(self) -> None:
+        # Explicit id: VACUUM may renumber an implicit rowid, and the FTS rows point at it
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS cases (
+                id INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL UNIQUE,
+                url TEXT NOT NULL,
+                source TEXT,
+                model TEXT,
+                transcript TEXT NOT NULL,
+                summaries TEXT NOT NULL,
+                dossier TEXT NOT NULL,
+                entities TEXT NOT NULL,
+                claims TEXT NOT NULL,
+                meta TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS cases_updated ON cases (updated_at)")
+        # One row per case with rowid = cases.id, so replacing a case is a rowid lookup.
+        # remove_diacritics: "opcao" finds "opção", as people type in search boxes
+        self._db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(
+                transcript, entities, dossier,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+
+    def _migrate(self) -> None:
+        """Rebuild a store from before cases had an id and the FTS rows were keyed by it."""
+        logger.info(f"Case store {self.path}: rebuilding tables and search index")
+        columns = "video_id, url, source, model, transcript, summaries, dossier, entities, claims, meta, updated_at"
+        self._db.execute("BEGIN")
+        try:
+            self._db.execute("ALTER TABLE cases RENAME TO cases_old")
+            self._db.execute("DROP INDEX IF EXISTS cases_updated")
+            self._db.execute("DROP TABLE IF EXISTS cases_fts")
+            self._create_tables()
+            self._db.execute(f"INSERT INTO cases ({columns}) SELECT {columns} FROM cases_old")
+            self._db.execute("DROP TABLE cases_old")
+            rows = self._db.execute("SELECT id, transcript, entities, claims, dossier FROM cases").fetchall()
+            for case_id, transcript, entities, claims, dossier in rows:
+                self._db.execute(
+                    "INSERT INTO cases_fts (rowid, transcript, entities, dossier) VALUES (?, ?, ?, ?)",
+                    (case_id, transcript, _entity_text(json.loads(entities), json.loads(claims)), dossier),
+                )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def save(
+        self,
+        video_id: str,
+        url: str,
+        transcript: str,
+        result: dict,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+        meta: Optional[dict] = None,
+    ) -> None:
+        """Record a `generate_dossier` result for `video_id`, replacing any earlier one."""
+        entities = result.get("entities") or {"people": [], "organizations": []}
+        claims = result.get("claims") or []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                # Upsert keeps the case's id, and with it the rowid of its FTS row
+                self._db.execute(
+                    """INSERT INTO cases
+                       (video_id, url, source, model, transcript, summaries, dossier, entities, claims, meta, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (video_id) DO UPDATE SET
+                           url = excluded.url, source = excluded.source, model = excluded.model,
+                           transcript = excluded.transcript, summaries = excluded.summaries,
+                           dossier = excluded.dossier, entities = excluded.entities, claims = excluded.claims,
+                           meta = excluded.meta, updated_at = excluded.updated_at""",
+                    (
+                        video_id, url, source, model, transcript,
+                        json.dumps(result.get("summaries") or [], ensure_ascii=False),
+                        result["dossier"],
+                        json.dumps(entities, ensure_ascii=False),
+                        json.dumps(claims, ensure_ascii=False),
+                        json.dumps(meta or {}, ensure_ascii=False),
+                        time.time(),
+                    ),
+                )
+                case_id = self._db.execute("SELECT id FROM cases WHERE video_id = ?", (video_id,)).fetchone()[0]
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cases_fts (rowid, transcript, entities, dossier) VALUES (?, ?, ?, ?)",
+                    (case_id, transcript, _entity_text(entities, claims), result["dossier"]),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def get(self, video_id: str) -> Optional[dict]:
+        """The full case, or None."""
+        with self._lock:
+            row = self._db.execute(
+                """SELECT video_id, url, source, model, transcript, summaries, dossier, entities, claims, meta, updated_at
+                   FROM cases WHERE video_id = ?""",
+                (video_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        video_id, url, source, model, transcript, summaries, dossier, entities, claims, meta, updated_at = row
+        return {
+            "video_id": video_id,
+            "url": url,
+            "source": source,
+            "model": model,
+            "transcript": transcript,
+            "summaries": json.loads(summaries),
+            "dossier": dossier,
+            "entities": json.loads(entities),
+            "claims": json.loads(claims),
+            "meta": json.loads(meta),
+            "updated_at": updated_at,
+        }
+
+    def list(self, limit: int = 50, offset: int = 0) -> dict:
+        """Most recent cases first, without the large text fields."""
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+            rows = self._db.execute(
+                """SELECT video_id, url, source, model, updated_at FROM cases
+                   ORDER BY updated_at DESC LIMIT ? OFFSET ?""",
+                (limit, offset),
+            ).fetchall()
+        cases = [
+            {"video_id": v, "url": u, "source": s, "model": m, "updated_at": t}
+            for v, u, s, m, t in rows
+        ]
+        return {"total": total, "cases": cases}
+
+    def search(self, q: str, limit: int = 20) -> list:
+        """Cases matching every word of `q`, best match first, with a snippet."""
+        query = fts_query(q)
+        if not query:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                """SELECT c.video_id, c.url, c.updated_at,
+                          snippet(cases_fts, -1, '[', ']', '…', 16), bm25(cases_fts)
+                   FROM cases_fts f JOIN cases c ON c.id = f.rowid
+                   WHERE cases_fts MATCH ?
+                   ORDER BY bm25(cases_fts) LIMIT ?""",
+                (query, limit),
+            ).fetchall()
+        return [
+            {"video_id": v, "url": u, "updated_at": t, "snippet": snip, "score": round(-score, 4)}
+            for v, u, t, snip, score in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,190 @@
+import re
+from typing import Optional
+
+# Average characters per token by model family. Tokenizers differ, and
+# Portuguese runs a little denser than English, so these err on the low side.
+CHARS_PER_TOKEN = {
+    "mistral": 3.5,
+    "mixtral": 3.5,
+    "llama": 3.6,
+    "qwen": 3.3,
+    "gemma": 3.8,
+    "phi": 3.4,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+# Boundary strength at the end of a word: higher is a better place to cut
+PARAGRAPH, SENTENCE, LINE, PAUSE, WORD = 4, 3, 2, 1, 0
+
+_UNIT_RE = re.compile(r"(\S+)(\s*)")
+_SENTENCE_END_RE = re.compile(r"[.!?…]+[\"'”’)\]]*$")
+_PAUSE_END_RE = re.compile(r"[,;:]$|^[-–—]$|\.\.\.$")
+
+
+def chars_per_token(model: Optional[str] = None) -> float:
+    if model:
+        family = model.split("/")[-1].lower()
+        for prefix, ratio in CHARS_PER_TOKEN.items():
+            if family.startswith(prefix):
+                return ratio
+    return DEFAULT_CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Estimated token count of `text` for `model`'s tokenizer."""
+    return int(len(text) / chars_per_token(model)) + 1
+
+
+def _boundary(word: str, space: str) -> int:
+    if space.count("\n") > 1:
+        return PARAGRAPH
+    if _SENTENCE_END_RE.search(word) and not word.endswith("..."):
+        return SENTENCE
+    if "\n" in space:
+        return LINE
+    if _PAUSE_END_RE.search(word):
+        return PAUSE
+    return WORD
+
+
+def split_units(text: str, pos: int = 0) -> list:
+    """Words of `text` from `pos` on as (start, end, boundary_strength) spans, trailing space included."""
+    return [
+        (m.start(), m.end(), _boundary(m.group(1), m.group(2)))
+        for m in _UNIT_RE.finditer(text, pos)
+    ]
+
+
+def _next_chunk(units: list, start: int, budget: int, min_fill: int, overlap: int, final: bool = True):
+    """(cut, next_start) for the chunk beginning at units[start].
+
+    `cut` is the index of the chunk's last unit and `next_start` where the
+    next chunk begins (len(units) when this is the last one). Unless
+    `final`, returns None when the text seen so far cannot settle the cut.
+    """
+    n = len(units)
+    base = units[start][0]
+    best = [-1] * (PARAGRAPH + 1)
+    j = start
+    # Always take at least one word, even if it alone exceeds the budget
+    while j < n and (j == start or units[j][1] - base <= budget):
+        if units[j][1] - base >= min_fill:
+            best[units[j][2]] = j
+        j += 1
+
+    if j >= n:
+        # The rest fits; more text could still change where to cut
+        return (n - 1, n) if final else None
+    cut = next((best[s] for s in range(PARAGRAPH, WORD, -1) if best[s] != -1), j - 1)
+
+    # Step back from the cut to carry some context into the next chunk
+    next_start = cut + 1
+    while next_start - 1 > start and units[cut][1] - units[next_start - 1][0] <= overlap:
+        next_start -= 1
+    # ...and start that context on a line or sentence boundary when there is one
+    for k in range(next_start, cut + 1):
+        if units[k - 1][2] >= LINE:
+            next_start = k
+            break
+    return cut, next_start
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = 2500,
+    overlap_tokens: int = 0,
+    model: Optional[str] = None,
+) -> list:
+    """Split text into chunks of at most ~`max_tokens` estimated tokens.
+
+    Cuts prefer, in order, paragraph, sentence, caption-line and pause
+    boundaries found past 60% of the budget, falling back to a word
+    boundary. Consecutive chunks share about `overlap_tokens` of context.
+    One left-to-right pass over the words; no backward searches.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    ratio = chars_per_token(model)
+    budget = max(1, int(max_tokens * ratio))
+    if len(text) <= budget:
+        return [text]
+    overlap = int(overlap_tokens * ratio)
+    min_fill = int(budget * 0.6)
+
+    units = split_units(text)
+    chunks = []
+    start = 0
+    while start < len(units):
+        cut, next_start = _next_chunk(units, start, budget, min_fill, overlap)
+        chunks.append(text[units[start][0]:units[cut][1]].strip())
+        start = next_start
+
+    return [c for c in chunks if c]
+
+
+class IncrementalChunker:
+    """`chunk_text` for text that arrives in pieces, e.g. Whisper segments.
+
+    `feed()` returns the chunks completed by the new text and `flush()` the
+    rest once the text has ended. The chunks are the same as `chunk_text`
+    would produce for the whole text, so cached chunk summaries are shared.
+    Words already split are kept between feeds and only the unfinished
+    last one is split again, so each feed costs about the size of the
+    new text, not of the buffered one.
+    """
+
+    def __init__(self, max_tokens: int = 2500, overlap_tokens: int = 0, model: Optional[str] = None):
+        ratio = chars_per_token(model)
+        self.budget = max(1, int(max_tokens * ratio))
+        self.overlap = int(overlap_tokens * ratio)
+        self.min_fill = int(self.budget * 0.6)
+        self._buffer = ""
+        self._units = []  # split_units(self._buffer); the last one may still grow
+        self._emitted = False
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        self._split_tail()
+        return self._drain(final=False)
+
+    def flush(self) -> list:
+        # chunk_text strips the text: trailing space must not count against the last chunk
+        self._buffer = self._buffer.rstrip()
+        self._split_tail()
+        chunks = self._drain(final=True)
+        self._buffer = ""
+        self._units = []
+        return chunks
+
+    def _split_tail(self) -> None:
+        # Every unit but the last is followed by another word, so it is settled
+        pos = self._units.pop()[0] if self._units else 0
+        self._units += split_units(self._buffer, pos)
+
+    def _drain(self, final: bool) -> list:
+        chunks = []
+        if final and not self._emitted:
+            # Same short-text shortcut as chunk_text
+            text = self._buffer.strip()
+            if len(text) <= self.budget:
+                return [text] if text else []
+        while self._units:
+            units = self._units
+            # Until a settled unit crosses the budget, the cut depends on the
+            # last one, which may still grow or turn out to end the text
+            if not final and (len(units) < 2 or units[-2][1] - units[0][0] <= self.budget):
+                break
+            cut, next_start = _next_chunk(units, 0, self.budget, self.min_fill, self.overlap, final)
+            chunk = self._buffer[units[0][0]:units[cut][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            self._emitted = True
+            if next_start >= len(units):
+                self._buffer = ""
+                self._units = []
+                break
+            offset = units[next_start][0]
+            self._buffer = self._buffer[offset:]
+            self._units = [(a - offset, b - offset, strength) for a, b, strength in units[next_start:]]
+        return chunks
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable, Optional
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.listeners: list = []
+        self.waiters = 0
+
+    def progress(self, stage: str, **counters) -> None:
+        for listener in list(self.listeners):
+            listener(stage, **counters)
+
+
+class RequestCoalescer:
+    """Run identical concurrent requests once.
+
+    The first caller for a key starts `work(progress)`; callers arriving
+    while it runs wait for the same result (or exception) instead of
+    starting their own. Progress reported by the work reaches every
+    attached caller. A caller that goes away does not cancel the work for
+    the others.
+    """
+
+    def __init__(self):
+        self._flights: dict = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        work: Callable[[Callable], Awaitable],
+        progress: Optional[Callable] = None,
+    ):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(work(flight.progress))
+            flight.task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            metrics.COALESCED_REQUESTS.inc()
+            logger.info(f"Attached to in-flight request {key} ({flight.waiters + 1} waiting)")
+
+        flight.waiters += 1
+        if progress:
+            flight.listeners.append(progress)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if progress:
+                flight.listeners.remove(progress)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,458 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+try:
+    from .cache import CHUNK_SUMMARIES, DOSSIERS, content_key
+    from .chunking import IncrementalChunker, chunk_text, estimate_tokens
+    from .entities import format_bullets, merge_claims, merge_entities, parse_chunk_summary, render_sections
+    from .metrics import CHUNK_NEAR_DUPLICATES, span
+except ImportError:
+    from cache import CHUNK_SUMMARIES, DOSSIERS, content_key
+    from chunking import IncrementalChunker, chunk_text, estimate_tokens
+    from entities import format_bullets, merge_claims, merge_entities, parse_chunk_summary, render_sections
+    from metrics import CHUNK_NEAR_DUPLICATES, span
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# PROMPTS
+# ============================================================================
+
+# The fixed instructions of each stage go in Ollama's `system` field and the
+# variable part in the prompt, so every call of a stage starts with the same
+# prefix and Ollama can skip re-evaluating it while the model stays loaded.
+
+# Chunk summaries come back as JSON: people, organizations and claims are
+# merged across chunks in code (entities.py) instead of by the final call.
+CHUNK_SYSTEM = """Você é um analista investigativo. Analise o TRECHO recebido e responda apenas com um objeto JSON:
+{"bullets": [...], "people": [...], "organizations": [...], "claims": [...]}
+- bullets: resumo em bullets curtos, mantendo fatos, nomes e números.
+- people: nomes completos das pessoas citadas.
+- organizations: empresas, órgãos e instituições citadas.
+- claims: afirmações verificáveis (fatos, números, datas), uma por item.
+Use listas vazias quando não houver nada. Não invente nada."""
+
+CHUNK_PROMPT = """TRECHO {idx}:
+{chunk}
+"""
+
+REDUCE_SYSTEM = """Você é um analista investigativo. Condense as notas recebidas em bullets curtos, sem perder fatos, nomes e números. Não invente nada."""
+
+REDUCE_PROMPT = """NOTAS ({label}):
+{notes}
+"""
+
+FINAL_SYSTEM = """Você é um jornalista investigativo e analista de inteligência.
+
+Com base nas notas por trecho recebidas, escreva a análise de um DOSSIÊ do conteúdo.
+Afirmações, pessoas e organizações já são listadas à parte: não as repita em seções próprias.
+IMPORTANTE:
+- Se algo não estiver explícito nas notas, diga "não confirmado".
+- Referências externas: sugira temas/fontes para checar (ex: "site do IBGE", "paper sobre X"), mas deixe claro que são sugestões de verificação.
+- Seja objetivo, estruturado e útil para tomada de decisão.
+
+Gere exatamente com estas seções em Markdown:
+
+## 🧠 Resumo executivo (máx. 6 bullets)
+## 🧪 Vieses, exageros, lacunas (lista + 2 linhas explicando)
+## 📚 Pistas de checagem (fontes/termos para pesquisar)"""
+
+FINAL_PROMPT = """NOTAS:
+{notes}
+"""
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def notes_label(first: int, last: int) -> str:
+    return f"Trecho {first}" if first == last else f"Trechos {first} a {last}"
+
+def format_notes(notes: list) -> str:
+    """Render (first, last, summary) notes as the NOTAS block of a prompt."""
+    return "\n\n".join([f"### {notes_label(first, last)}\n{summary}" for first, last, summary in notes])
+
+async def gather_in_order(coros: list, concurrency: int) -> list:
+    """Run coroutines with at most `concurrency` in flight, keeping input order.
+
+    The first failure cancels everything still running and is re-raised.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(coro):
+        async with sem:
+            return await coro
+
+    tasks = [asyncio.ensure_future(run(c)) for c in coros]
+    if not tasks:
+        return []
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for t in done:
+            if t.exception() is not None:
+                raise t.exception()
+        return [t.result() for t in tasks]
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def chunk_cache_key(chunk: str, model: str) -> str:
+    # The chunk position is left out on purpose so an unchanged chunk is
+    # reused even when edits elsewhere shift its index.
+    return content_key(model, CHUNK_SYSTEM, CHUNK_PROMPT, chunk)
+
+def dossier_cache_key(transcript: str, model: str, *settings) -> str:
+    return content_key(
+        model, CHUNK_SYSTEM, CHUNK_PROMPT, REDUCE_SYSTEM, REDUCE_PROMPT, FINAL_SYSTEM, FINAL_PROMPT,
+        "/".join(map(str, settings)), transcript,
+    )
+
+def cached_dossier(cache, key: str, on_token=None):
+    """Stored `generate_dossier` result for `key`, or None."""
+    cached = cache.get(DOSSIERS, key) if cache else None
+    if cached is None:
+        return None
+    logger.info("Dossier served from cache")
+    result = json.loads(cached)
+    if on_token:
+        on_token(result["dossier"])
+    return result
+
+def cached_summary(chunk: str, model: str, cache=None, index=None) -> Optional[str]:
+    """Stored summary of `chunk`, or of a near-duplicate chunk found in `index`."""
+    if not cache:
+        return None
+    key = chunk_cache_key(chunk, model)
+    s = cache.get(CHUNK_SUMMARIES, key)
+    if s is not None or index is None:
+        return s
+    match = index.lookup(chunk, model)
+    if match is None:
+        return None
+    near_key, score = match
+    s = cache.get(CHUNK_SUMMARIES, near_key)
+    if s is None:
+        index.discard(near_key)
+        return None
+    # Stored under this chunk's own key too, so the next run is an exact hit
+    cache.set(CHUNK_SUMMARIES, key, s)
+    CHUNK_NEAR_DUPLICATES.inc()
+    logger.info(f"Reusing the summary of a near-duplicate chunk (similarity {score:.2f})")
+    return s
+
+async def summarize_chunk(idx: int, chunk: str, model: str, client, cache=None, index=None) -> str:
+    """Summary of one chunk (1-based `idx`), stored in the cache when there is one.
+
+    With an `index`, the chunk is also fingerprinted so later near-duplicates can reuse the summary.
+    """
+    s = await client.generate(
+        CHUNK_PROMPT.format(idx=idx, chunk=chunk), model=model, system=CHUNK_SYSTEM, format="json"
+    )
+    if cache:
+        key = chunk_cache_key(chunk, model)
+        cache.set(CHUNK_SUMMARIES, key, s)
+        if index is not None:
+            index.add(chunk, model, key)
+    return s
+
+async def summarize_chunks(
+    chunks: list, model: str, client, concurrency: int = 4, cache=None, progress=None, index=None
+) -> list:
+    """Summarize chunks concurrently, returning summaries in chunk order.
+
+    With a cache, only chunks without a stored summary are sent to Ollama;
+    with an `index` (fingerprint.ChunkIndex), neither are chunks close
+    enough to one summarized before.
+    `progress(stage, **counters)` is called as each chunk finishes.
+    """
+    summaries = [None] * len(chunks)
+    missing = []
+    for i, c in enumerate(chunks):
+        cached = cached_summary(c, model, cache, index)
+        if cached is not None:
+            summaries[i] = cached
+        else:
+            missing.append(i)
+    if cache and len(missing) < len(chunks):
+        logger.info(f"Reusing {len(chunks) - len(missing)}/{len(chunks)} cached chunk summaries")
+
+    done = len(chunks) - len(missing)
+    if progress:
+        progress("summarizing", chunks_done=done, chunks_total=len(chunks))
+
+    async def summarize(i: int) -> str:
+        nonlocal done
+        s = await summarize_chunk(i + 1, chunks[i], model, client, cache, index)
+        done += 1
+        if progress:
+            progress("summarizing", chunks_done=done, chunks_total=len(chunks))
+        return s
+
+    results = await gather_in_order([summarize(i) for i in missing], concurrency)
+    for i, s in zip(missing, results):
+        summaries[i] = s
+    return summaries
+
+async def summarize_stream(
+    pieces: AsyncIterator[str],
+    model: str,
+    client,
+    concurrency: int = 4,
+    cache=None,
+    progress=None,
+    chunk_tokens: int = 2500,
+    overlap_tokens: int = 0,
+    index=None,
+) -> tuple:
+    """Chunk and summarize text while it is still arriving.
+
+    Each chunk is sent to Ollama as soon as `pieces` has completed it, so
+    summaries run alongside transcription. Returns (transcript, summaries)
+    with summaries in chunk order.
+    """
+    chunker = IncrementalChunker(chunk_tokens, overlap_tokens, model)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    tasks = []
+    parts = []
+    done = 0
+
+    async def summarize(idx: int, chunk: str) -> str:
+        nonlocal done
+        s = cached_summary(chunk, model, cache, index)
+        if s is None:
+            async with sem:
+                s = await summarize_chunk(idx, chunk, model, client, cache, index)
+        done += 1
+        if progress:
+            progress("summarizing", chunks_done=done, chunks_total=len(tasks))
+        return s
+
+    def dispatch(chunks: list) -> None:
+        for t in tasks:
+            if t.done() and t.exception() is not None:
+                raise t.exception()
+        for chunk in chunks:
+            tasks.append(asyncio.ensure_future(summarize(len(tasks) + 1, chunk)))
+
+    try:
+        async for piece in pieces:
+            parts.append(piece)
+            dispatch(chunker.feed(piece))
+        dispatch(chunker.flush())
+        summaries = await asyncio.gather(*tasks)
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return "".join(parts).strip(), list(summaries)
+
+async def reduce_notes(
+    notes: list,
+    model: str,
+    client,
+    token_budget: int = 6000,
+    fan_in: int = 4,
+    concurrency: int = 4,
+    cache=None,
+    progress=None,
+) -> list:
+    """Condense notes level by level until they fit `token_budget`.
+
+    Notes are (first_chunk, last_chunk, summary) tuples. Each level merges
+    groups of `fan_in` neighbouring notes into one, with all groups of a
+    level condensed in parallel.
+    """
+    fan_in = max(2, fan_in)
+    level = 0
+    while len(notes) > 1 and estimate_tokens(format_notes(notes), model) > token_budget:
+        level += 1
+        groups = [notes[i:i + fan_in] for i in range(0, len(notes), fan_in)]
+        logger.info(f"Reduce level {level}: {len(notes)} notes -> {len(groups)}")
+        if progress:
+            progress("reducing", level=level, groups=len(groups))
+
+        async def condense(group: list) -> tuple:
+            if len(group) == 1:
+                return group[0]
+            first, last = group[0][0], group[-1][1]
+            block = format_notes(group)
+            key = content_key(model, REDUCE_SYSTEM, REDUCE_PROMPT, block)
+            cached = cache.get(CHUNK_SUMMARIES, key) if cache else None
+            if cached is not None:
+                return first, last, cached
+            prompt = REDUCE_PROMPT.format(label=notes_label(first, last), notes=block)
+            s = await client.generate(prompt, model=model, system=REDUCE_SYSTEM)
+            if cache:
+                cache.set(CHUNK_SUMMARIES, key, s)
+            return first, last, s
+
+        notes = await gather_in_order([condense(g) for g in groups], concurrency)
+    return notes
+
+async def generate_dossier(
+    transcript: str,
+    model: str,
+    client,
+    concurrency: int = 4,
+    cache=None,
+    progress=None,
+    on_token=None,
+    token_budget: int = 6000,
+    fan_in: int = 4,
+    chunk_tokens: int = 2500,
+    overlap_tokens: int = 0,
+    reduce_model: Optional[str] = None,
+    index=None,
+) -> dict:
+    """Generate dossier using Ollama.
+
+    The transcript is split into chunks of about `chunk_tokens`. Chunk summaries are condensed by `reduce_notes` until the final prompt's
+    notes fit `token_budget`. With `on_token`, the final synthesis is
+    streamed and each fragment is passed to it as soon as Ollama produces it.
+    Chunks are summarized with `model`; reduce and the final synthesis use
+    `reduce_model` (default: `model`). With an `index`, chunks that nearly
+    match one summarized before reuse its summary.
+    Returns {"dossier": markdown, "entities": {...}, "claims": [...],
+    "summaries": [...]} with one bullet list per chunk in `summaries`.
+    """
+    reduce_model = reduce_model or model
+    key = dossier_cache_key(transcript, model, reduce_model, token_budget, fan_in, chunk_tokens, overlap_tokens)
+    cached = cached_dossier(cache, key, on_token)
+    if cached is not None:
+        return cached
+
+    chunks = chunk_text(transcript, max_tokens=chunk_tokens, overlap_tokens=overlap_tokens, model=model)
+
+    # First pass: summarize each chunk
+    with span("chunk_summaries"):
+        chunk_summaries = await summarize_chunks(
+            chunks, model=model, client=client, concurrency=concurrency, cache=cache, progress=progress,
+            index=index,
+        )
+
+    result = await synthesize(
+        chunk_summaries, model=reduce_model, client=client, concurrency=concurrency, cache=cache,
+        progress=progress, on_token=on_token, token_budget=token_budget, fan_in=fan_in,
+    )
+    if cache:
+        cache.set(DOSSIERS, key, json.dumps(result, ensure_ascii=False))
+    return result
+
+async def generate_dossier_from_stream(
+    pieces: AsyncIterator[str],
+    model: str,
+    client,
+    concurrency: int = 4,
+    cache=None,
+    progress=None,
+    on_token=None,
+    token_budget: int = 6000,
+    fan_in: int = 4,
+    chunk_tokens: int = 2500,
+    overlap_tokens: int = 0,
+    reduce_model: Optional[str] = None,
+    index=None,
+) -> tuple:
+    """`generate_dossier` for a transcript that arrives in pieces.
+
+    Chunk summaries start while `pieces` (e.g. Whisper segments) is still
+    producing text. Returns (transcript, result) with `result` as in
+    `generate_dossier`.
+    """
+    with span("chunk_summaries"):
+        transcript, chunk_summaries = await summarize_stream(
+            pieces, model=model, client=client, concurrency=concurrency, cache=cache,
+            progress=progress, chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens, index=index,
+        )
+
+    reduce_model = reduce_model or model
+    key = dossier_cache_key(transcript, model, reduce_model, token_budget, fan_in, chunk_tokens, overlap_tokens)
+    cached = cached_dossier(cache, key, on_token)
+    if cached is not None:
+        return transcript, cached
+
+    result = await synthesize(
+        chunk_summaries, model=reduce_model, client=client, concurrency=concurrency, cache=cache,
+        progress=progress, on_token=on_token, token_budget=token_budget, fan_in=fan_in,
+    )
+    if cache:
+        cache.set(DOSSIERS, key, json.dumps(result, ensure_ascii=False))
+    return transcript, result
+
+async def synthesize(
+    chunk_summaries: list,
+    model: str,
+    client,
+    concurrency: int = 4,
+    cache=None,
+    progress=None,
+    on_token=None,
+    token_budget: int = 6000,
+    fan_in: int = 4,
+) -> dict:
+    """Reduce the chunk summaries and write the final dossier.
+
+    Entities and claims are merged from the structured chunk summaries and
+    rendered in code; only the bullets go through reduce and the final call.
+    """
+    parsed = [parse_chunk_summary(s) for s in chunk_summaries]
+    entities = merge_entities(parsed)
+    claims = merge_claims(parsed)
+    sections = render_sections(entities, claims)
+
+    # Reduce tree: condense the notes until they fit the final prompt
+    notes = [(i, i, format_bullets(summary)) for i, summary in enumerate(parsed, 1)]
+    with span("reduce"):
+        notes = await reduce_notes(
+            notes, model=model, client=client, token_budget=token_budget, fan_in=fan_in,
+            concurrency=concurrency, cache=cache, progress=progress,
+        )
+
+    # Second pass: final synthesis
+    joined = format_notes(notes)
+
+    if progress:
+        progress("synthesizing")
+    final_prompt = FINAL_PROMPT.format(notes=joined)
+    with span("final_synthesis"):
+        if on_token:
+            parts = []
+            async for token in client.generate_stream(final_prompt, model=model, system=FINAL_SYSTEM):
+                parts.append(token)
+                on_token(token)
+            analysis = "".join(parts).strip()
+            on_token("\n\n" + sections)
+        else:
+            analysis = await client.generate(final_prompt, model=model, system=FINAL_SYSTEM)
+    return {
+        "dossier": f"{analysis}\n\n{sections}",
+        "entities": entities,
+        "claims": claims,
+        "summaries": [format_bullets(summary) for summary in parsed],
+    }
+
+def render_markdown(url: str, video_id: str, dossier: str, transcript: str) -> str:
+    """Full dossier document: front matter, dossier and raw transcript."""
+    return f"""---
+type: video
+url: {url}
+video_id: {video_id}
+generated_at: {datetime.utcnow().isoformat()}
+---
+
+# 🎥 Dossiê do vídeo
+
+{dossier}
+
+---
+
+# 📝 Transcrição (bruta)
+
+{transcript}
+"""
@@ -0,0 +1,136 @@
+import json
+import re
+import unicodedata
+
+FIELDS = ("bullets", "people", "organizations", "claims")
+
+# Two claims whose word sets overlap this much are treated as the same claim
+CLAIM_SIMILARITY = 0.8
+
+_WORD_RE = re.compile(r"\w+")
+_EDGE_RE = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+
+
+def _as_text(item) -> str:
+    # Models sometimes return {"name": ...} or {"text": ...} instead of a plain string
+    if isinstance(item, dict):
+        for key in ("name", "text", "nome", "texto"):
+            if isinstance(item.get(key), str):
+                return item[key].strip()
+        item = next((v for v in item.values() if isinstance(v, str)), "")
+    return item.strip() if isinstance(item, str) else ""
+
+
+def parse_chunk_summary(text: str) -> dict:
+    """The {"bullets", "people", "organizations", "claims"} lists of one chunk summary.
+
+    Text that is not a JSON object (e.g. a summary cached before chunk
+    summaries were structured) is read as plain bullets.
+    """
+    data = None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if 0 <= start < end:
+            try:
+                data = json.loads(text[start:end + 1])
+            except ValueError:
+                pass
+    if not isinstance(data, dict):
+        lines = [_EDGE_RE.sub("", line) for line in text.splitlines()]
+        return {"bullets": [line for line in lines if line], "people": [], "organizations": [], "claims": []}
+
+    parsed = {}
+    for field in FIELDS:
+        items = data.get(field) or []
+        if not isinstance(items, list):
+            items = [items]
+        parsed[field] = [t for t in map(_as_text, items) if t]
+    return parsed
+
+
+def format_bullets(summary: dict) -> str:
+    """Bullets of a parsed chunk summary as the notes fed to reduce/final."""
+    return "\n".join([f"- {b}" for b in summary["bullets"]])
+
+
+def normalize_name(name: str) -> str:
+    """Comparison key for a name: no accents, case or surrounding punctuation."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    plain = "".join([c for c in decomposed if not unicodedata.combining(c)])
+    return " ".join(_EDGE_RE.sub("", plain).casefold().split())
+
+
+def _merge_names(summaries: list, field: str) -> list:
+    merged = {}
+    for idx, summary in enumerate(summaries, 1):
+        for name in summary[field]:
+            key = normalize_name(name)
+            if not key:
+                continue
+            entry = merged.setdefault(key, {"name": name, "mentions": 0, "chunks": []})
+            entry["mentions"] += 1
+            if entry["chunks"][-1:] != [idx]:
+                entry["chunks"].append(idx)
+    # Most mentioned first; ties keep order of first appearance
+    return sorted(merged.values(), key=lambda e: -e["mentions"])
+
+
+def merge_entities(summaries: list) -> dict:
+    """People and organizations across parsed chunk summaries, deduplicated.
+
+    Each entry is {"name", "mentions", "chunks"} with 1-based chunk numbers.
+    """
+    return {"people": _merge_names(summaries, "people"), "organizations": _merge_names(summaries, "organizations")}
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(_WORD_RE.findall(normalize_name(text)))
+
+
+def merge_claims(summaries: list, similarity: float = CLAIM_SIMILARITY) -> list:
+    """Verifiable claims across parsed chunk summaries, near-duplicates merged.
+
+    Each entry is {"text", "chunks"}; a claim repeated with slightly
+    different wording (overlapping chunks, recaps) is kept once.
+    """
+    claims = []
+    for idx, summary in enumerate(summaries, 1):
+        for text in summary["claims"]:
+            words = _words(text)
+            if not words:
+                continue
+            for claim in claims:
+                seen = claim["_words"]
+                if len(words & seen) / len(words | seen) >= similarity:
+                    if claim["chunks"][-1:] != [idx]:
+                        claim["chunks"].append(idx)
+                    break
+            else:
+                claims.append({"text": text, "chunks": [idx], "_words": words})
+    return [{"text": c["text"], "chunks": c["chunks"]} for c in claims]
+
+
+def _chunk_refs(chunks: list) -> str:
+    # "trechos 1-4, 7": consecutive chunk numbers collapsed into ranges
+    runs = []
+    for idx in chunks:
+        if runs and idx == runs[-1][1] + 1:
+            runs[-1][1] = idx
+        else:
+            runs.append([idx, idx])
+    label = "trecho" if len(chunks) == 1 else "trechos"
+    return f"{label} " + ", ".join([str(a) if a == b else f"{a}-{b}" for a, b in runs])
+
+
+def render_sections(entities: dict, claims: list) -> str:
+    """Markdown sections for the claims and entities, in the dossier's layout."""
+    none = "- Nenhuma identificada"
+    lines = ["## 📌 Afirmações verificáveis (lista)"]
+    lines += [f"- {c['text']} _({_chunk_refs(c['chunks'])})_" for c in claims] or [none]
+    lines += ["", "## 🧍 Pessoas citadas (lista)"]
+    lines += [f"- {e['name']} ({_chunk_refs(e['chunks'])})" for e in entities["people"]] or [none]
+    lines += ["", "## 🏢 Empresas/organizações citadas (lista)"]
+    lines += [f"- {e['name']} ({_chunk_refs(e['chunks'])})" for e in entities["organizations"]] or [none]
+    return "\n".join(lines)
@@ -0,0 +1,240 @@
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64  # MinHash values per chunk: 256 bytes, ~±0.06 on the similarity estimate
+BANDS = 16  # LSH bands of NUM_PERM // BANDS values; pairs above ~0.5 similarity become candidates
+SHINGLE_WORDS = 3
+SNAPSHOT_VERSION = 1
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = 4294967311  # smallest prime above 2**32
+# Fixed seed: signatures in a snapshot are only comparable under the same permutations
+_rng = np.random.RandomState(20240611)
+_A = _rng.randint(1, 2 ** 31 - 1, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31 - 1, size=NUM_PERM).astype(np.uint64)
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash of the word 3-grams of `text`, or None for text too short to compare.
+
+    Case and punctuation are ignored, so the same speech captioned or
+    chunked slightly differently still estimates as highly similar.
+    """
+    words = _WORD_RE.findall(text.casefold())
+    if len(words) < SHINGLE_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*x + b) mod p stays below 2**63 with 31-bit a and 32-bit x
+    permuted = (np.outer(hashes, _A) + _B) % _PRIME
+    return (permuted.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.mean(a == b))
+
+
+# Odd 64-bit multipliers folding a band's values into one int bucket key
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93], dtype=np.uint64)
+_BAND_SALT = np.arange(1, BANDS + 1, dtype=np.uint64) * np.uint64(0xFF51AFD7ED558CCD)
+
+
+def _band_keys(sig: np.ndarray) -> list:
+    """One int per LSH band of `sig`; equal bands give equal keys (rare collisions only add candidates)."""
+    rows = sig.reshape(BANDS, -1).astype(np.uint64)
+    h = (rows * _MIX[np.arange(rows.shape[1]) % len(_MIX)]).sum(axis=1) ^ _BAND_SALT
+    h ^= h >> np.uint64(29)
+    return h.tolist()
+
+
+class ChunkIndex:
+    """Near-duplicate lookup over chunks whose summaries are already cached.
+
+    Each entry maps a chunk's MinHash signature to the cache key of its
+    summary, per model, and LSH buckets keep lookups from scanning every
+    entry. A chunk whose estimated similarity to an indexed one reaches
+    `threshold` can reuse that summary: reuploads, clips and compilations
+    of videos already processed skip Ollama. The index lives in memory;
+    `save()` writes a JSON snapshot to `path`, loaded back on start. At
+    most `max_entries` chunks are kept, least recently matched dropped
+    first.
+
+    Entries live in numbered slots: signatures in one uint32 matrix, and
+    each band's bucket maps an int key to the slots in it, so an entry
+    costs about 1.7 KB.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.85, max_entries: int = 100000):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self._sigs = np.empty((0, NUM_PERM), dtype=np.uint32)  # slot -> signature, grown by doubling
+        self._used = np.empty(0, dtype=np.int64)  # slot -> tick of the last insert or match, for LRU
+        self._tick = 0
+        self._keys = []  # slot -> summary key, None when free
+        self._models = []  # slot -> model
+        self._model_names = {}  # one str object per model name
+        self._slots = {}  # summary key -> slot
+        self._free = []
+        self._buckets = {}  # band key -> slot, or list of slots when shared
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def lookup(self, text: str, model: str) -> Optional[tuple]:
+        """(summary key, similarity) of the closest indexed chunk for `model`, or None."""
+        sig = signature(text)
+        if sig is None:
+            return None
+        band_keys = _band_keys(sig)
+        with self._lock:
+            candidates = set()
+            for band_key in band_keys:
+                found = self._buckets.get(band_key)
+                if found is None:
+                    continue
+                if isinstance(found, list):
+                    candidates.update(found)
+                else:
+                    candidates.add(found)
+            slots = [slot for slot in candidates if self._models[slot] == model]
+            if not slots:
+                return None
+            scores = (self._sigs[slots] == sig).mean(axis=1)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            slot = slots[best]
+            self._touch(slot)
+            return self._keys[slot], float(scores[best])
+
+    def add(self, text: str, model: str, key: str) -> None:
+        """Index the chunk `text` whose `model` summary is cached under `key`."""
+        sig = signature(text)
+        if sig is None:
+            return
+        with self._lock:
+            self._insert(key, model, sig)
+            self._dirty = True
+
+    def discard(self, key: str) -> None:
+        """Forget an entry, e.g. once its summary has left the cache."""
+        with self._lock:
+            if key in self._slots:
+                self._remove(key)
+                self._dirty = True
+
+    def save(self) -> None:
+        """Write the snapshot if anything changed since the last one."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            # Least recently used first, so loading restores the eviction order
+            order = sorted(self._slots.values(), key=lambda slot: self._used[slot])
+            entries = [
+                [self._keys[slot], self._models[slot], base64.b64encode(self._sigs[slot].tobytes()).decode("ascii")]
+                for slot in order
+            ]
+            self._dirty = False
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": SNAPSHOT_VERSION, "num_perm": NUM_PERM, "entries": entries}, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            raise
+        logger.info(f"Chunk index snapshot: {len(entries)} chunks -> {self.path}")
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION or data.get("num_perm") != NUM_PERM:
+                logger.warning(f"Ignoring chunk index snapshot {self.path}: different format")
+                return
+            for key, model, encoded in data["entries"]:
+                self._insert(key, model, np.frombuffer(base64.b64decode(encoded), dtype=np.uint32))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # A broken snapshot only costs the reuse it would have enabled
+            logger.warning(f"Ignoring chunk index snapshot {self.path}: {e!r}")
+            for key in list(self._slots):
+                self._remove(key)
+            return
+        logger.info(f"Chunk index: {len(self._slots)} chunks loaded from {self.path}")
+
+    def _touch(self, slot: int) -> None:
+        self._tick += 1
+        self._used[slot] = self._tick
+
+    def _new_slot(self) -> int:
+        if self._free:
+            return self._free.pop()
+        slot = len(self._keys)
+        if slot == len(self._sigs):
+            capacity = min(self.max_entries, max(1024, 2 * len(self._sigs)))
+            sigs = np.empty((capacity, NUM_PERM), dtype=np.uint32)
+            sigs[:slot] = self._sigs
+            used = np.zeros(capacity, dtype=np.int64)
+            used[:slot] = self._used
+            self._sigs, self._used = sigs, used
+        self._keys.append(None)
+        self._models.append(None)
+        return slot
+
+    def _insert(self, key: str, model: str, sig: np.ndarray) -> None:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._touch(slot)
+            return
+        if len(self._slots) >= self.max_entries:
+            # Full: every slot is taken, so the oldest tick is the least recently used entry
+            self._remove(self._keys[int(np.argmin(self._used[:len(self._keys)]))])
+        slot = self._new_slot()
+        self._sigs[slot] = sig
+        self._keys[slot] = key
+        self._models[slot] = self._model_names.setdefault(model, model)
+        self._slots[key] = slot
+        self._touch(slot)
+        for band_key in _band_keys(sig):
+            found = self._buckets.get(band_key)
+            if found is None:
+                self._buckets[band_key] = slot
+            elif isinstance(found, list):
+                found.append(slot)
+            else:
+                self._buckets[band_key] = [found, slot]
+
+    def _remove(self, key: str) -> None:
+        slot = self._slots.pop(key)
+        for band_key in _band_keys(self._sigs[slot]):
+            found = self._buckets.get(band_key)
+            if found == slot:
+                del self._buckets[band_key]
+            elif isinstance(found, list):
+                found.remove(slot)
+                if len(found) == 1:
+                    self._buckets[band_key] = found[0]
+        self._keys[slot] = None
+        self._models[slot] = None
+        self._free.append(slot)
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # queued | running | done | failed
+    stage: str = "queued"
+    progress: dict = field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[dict] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    key: Optional[Hashable] = None
+
+    def update(self, stage: str, **progress) -> None:
+        """Record the current pipeline stage and its progress counters."""
+        self.stage = stage
+        self.progress = progress
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs submitted pipelines on a fixed pool of asyncio workers.
+
+    At most `max_queued` jobs wait at a time; further submissions raise
+    JobQueueFull so the API can shed load. Finished jobs are kept for `ttl`
+    seconds so their result can be fetched. Jobs submitted with a `key` are
+    deduplicated: while one is queued or running, `find(key)` returns it.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 100, ttl: float = 3600):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._jobs: dict = {}
+        self._active: dict = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self,
+        run: Callable[[Job], Awaitable[dict]],
+        on_error: Optional[Callable[[Exception], dict]] = None,
+        cleanup: Optional[Callable[[], None]] = None,
+        key: Optional[Hashable] = None,
+    ) -> Job:
+        """Queue `run(job)`; its return value becomes the job result.
+
+        `on_error` turns an exception into the job's error payload and
+        `cleanup` runs once the job finishes, whatever the outcome.
+        """
+        self._prune()
+        job = Job(id=uuid.uuid4().hex, key=key)
+        try:
+            self._queue.put_nowait((job, run, on_error, cleanup))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue full ({self.max_queued} pending)")
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active[key] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def find(self, key: Hashable) -> Optional[Job]:
+        """The queued or running job submitted with `key`, if any."""
+        return self._active.get(key)
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def capacity(self) -> int:
+        """How many more jobs can be queued right now."""
+        return self.max_queued - self.queued() if self.max_queued > 0 else 1 << 30
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job, run, on_error, cleanup = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await run(job)
+                job.status = "done"
+                job.update("done")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e!r}")
+                job.status = "failed"
+                job.error = on_error(e) if on_error else {"detail": str(e)}
+            finally:
+                job.finished_at = time.time()
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+                if cleanup:
+                    cleanup()
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than the TTL."""
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,222 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Seconds, spanning sub-second cache hits up to the 600s Ollama timeout
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with optional labels."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                pairs = [f'{label}="{value}"' for label, value in zip(self.labels, key)]
+                for bound, count in zip(self.buckets, series["counts"]):
+                    le = ",".join(pairs + [f'le="{bound}"'])
+                    lines.append(f"{self.name}_bucket{{{le}}} {count}")
+                le = ",".join(pairs + ['le="+Inf"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {series['count']}")
+                suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+                lines.append(f"{self.name}_sum{suffix} {series['sum']}")
+                lines.append(f"{self.name}_count{suffix} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style monotonically increasing counter."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+
+STAGE_SECONDS = Histogram(
+    "dossier_stage_seconds", "Time spent in each pipeline stage.", labels=("stage",)
+)
+OLLAMA_SECONDS = Histogram(
+    "ollama_request_seconds", "Wall time of Ollama generate calls.", labels=("stage", "model")
+)
+OLLAMA_PROMPT_CHARS = Histogram(
+    "ollama_prompt_chars", "Prompt size in characters.", labels=("stage",), buckets=SIZE_BUCKETS
+)
+OLLAMA_RESPONSE_CHARS = Histogram(
+    "ollama_response_chars", "Response size in characters.", labels=("stage",), buckets=SIZE_BUCKETS
+)
+OLLAMA_PROMPT_TOKENS = Histogram(
+    "ollama_prompt_tokens", "prompt_eval_count reported by Ollama.", labels=("stage",), buckets=SIZE_BUCKETS
+)
+OLLAMA_EVAL_TOKENS = Histogram(
+    "ollama_eval_tokens", "eval_count (generated tokens) reported by Ollama.", labels=("stage",), buckets=SIZE_BUCKETS
+)
+OLLAMA_PROMPT_EVAL_SECONDS = Histogram(
+    "ollama_prompt_eval_seconds", "prompt_eval_duration (prefill) reported by Ollama.", labels=("stage",)
+)
+OLLAMA_LOAD_SECONDS = Histogram(
+    "ollama_load_seconds", "load_duration (model load) reported by Ollama.", labels=("stage",)
+)
+OLLAMA_EVAL_SECONDS = Histogram(
+    "ollama_eval_seconds", "eval_duration (generation) reported by Ollama.", labels=("stage",)
+)
+OLLAMA_QUEUE_SECONDS = Histogram(
+    "ollama_queue_seconds", "Time Ollama calls waited for a scheduler slot.", labels=("priority",)
+)
+OLLAMA_REJECTED = Counter(
+    "ollama_rejected_total", "Requests rejected because the tenant had as many in progress as allowed."
+)
+AUDIO_SILENCE_REMOVED_SECONDS = Counter(
+    "audio_silence_removed_seconds_total", "Seconds of silence cut from uploads before Whisper."
+)
+TRANSCRIPT_CHARS_REMOVED = Counter(
+    "transcript_normalized_chars_removed_total", "Characters of caption noise and repeats removed before chunking."
+)
+CHUNK_NEAR_DUPLICATES = Counter(
+    "chunk_near_duplicates_total", "Chunk summaries reused from a near-duplicate chunk instead of calling Ollama."
+)
+COALESCED_REQUESTS = Counter(
+    "dossier_coalesced_requests_total", "Requests that attached to an identical request already in flight."
+)
+
+REGISTRY = [
+    STAGE_SECONDS,
+    OLLAMA_SECONDS,
+    OLLAMA_PROMPT_CHARS,
+    OLLAMA_RESPONSE_CHARS,
+    OLLAMA_PROMPT_TOKENS,
+    OLLAMA_EVAL_TOKENS,
+    OLLAMA_PROMPT_EVAL_SECONDS,
+    OLLAMA_LOAD_SECONDS,
+    OLLAMA_EVAL_SECONDS,
+    OLLAMA_QUEUE_SECONDS,
+    OLLAMA_REJECTED,
+    COALESCED_REQUESTS,
+    AUDIO_SILENCE_REMOVED_SECONDS,
+    TRANSCRIPT_CHARS_REMOVED,
+    CHUNK_NEAR_DUPLICATES,
+]
+
+# Per-request state: the current stage name and the request's timing breakdown.
+# Context variables follow asyncio tasks and to_thread calls started from a span.
+_stage: contextvars.ContextVar = contextvars.ContextVar("dossier_stage", default="other")
+_timings: contextvars.ContextVar = contextvars.ContextVar("dossier_timings", default=None)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def collect_timings() -> Iterator[dict]:
+    """Collect the timing breakdown of everything run inside the block."""
+    timings = {"stages": {}, "ollama": {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "eval_tokens": 0,
+                                        "load_seconds": 0.0,
+                                        "prompt_eval_seconds": 0.0, "eval_seconds": 0.0}}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a pipeline stage; Ollama calls made inside are labelled with it."""
+    token = _stage.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record time spent in a stage that cannot be wrapped in `span`, e.g. a producer interleaved with others."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        stages = timings["stages"]
+        stages[stage] = round(stages.get(stage, 0.0) + seconds, 4)
+
+
+def record_ollama_call(
+    model: str,
+    seconds: float,
+    prompt: str,
+    response: str,
+    stats: Optional[dict] = None,
+    system: Optional[str] = None,
+) -> None:
+    """Record one generate call, with the counters from Ollama's final message.
+
+    Ollama only counts the prompt tokens it actually evaluated: a `system`
+    prefix reused from the previous call shows up as a lower
+    prompt_eval_count and prompt_eval_duration, not as a separate number.
+    """
+    stage = _stage.get()
+    stats = stats or {}
+    full_prompt = (system or "") + prompt
+    prompt_tokens = stats.get("prompt_eval_count") or 0
+    eval_tokens = stats.get("eval_count") or 0
+    prompt_eval_seconds = (stats.get("prompt_eval_duration") or 0) / 1e9
+    eval_seconds = (stats.get("eval_duration") or 0) / 1e9
+    load_seconds = (stats.get("load_duration") or 0) / 1e9
+
+    OLLAMA_SECONDS.observe(seconds, stage=stage, model=model)
+    OLLAMA_PROMPT_CHARS.observe(len(full_prompt), stage=stage)
+    OLLAMA_RESPONSE_CHARS.observe(len(response), stage=stage)
+    if stats:
+        OLLAMA_PROMPT_TOKENS.observe(prompt_tokens, stage=stage)
+        OLLAMA_EVAL_TOKENS.observe(eval_tokens, stage=stage)
+        OLLAMA_PROMPT_EVAL_SECONDS.observe(prompt_eval_seconds, stage=stage)
+        OLLAMA_LOAD_SECONDS.observe(load_seconds, stage=stage)
+        OLLAMA_EVAL_SECONDS.observe(eval_seconds, stage=stage)
+
+    timings = _timings.get()
+    if timings is not None:
+        totals = timings["ollama"]
+        totals["calls"] += 1
+        totals["seconds"] = round(totals["seconds"] + seconds, 4)
+        totals["prompt_tokens"] += prompt_tokens
+        totals["eval_tokens"] += eval_tokens
+        totals["load_seconds"] = round(totals["load_seconds"] + load_seconds, 4)
+        totals["prompt_eval_seconds"] = round(totals["prompt_eval_seconds"] + prompt_eval_seconds, 4)
+        totals["eval_seconds"] = round(totals["eval_seconds"] + eval_seconds, 4)
@@ -0,0 +1,71 @@
+import logging
+import os
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "mistral:latest"
+
+
+def configured_models(env: Optional[Mapping] = None) -> dict:
+    """{"map", "reduce", "fallback"} Ollama models from the environment, as the API and CLI both read them.
+
+    OLLAMA_MAP_MODEL and OLLAMA_REDUCE_MODEL each default to OLLAMA_MODEL,
+    so setting only one of them leaves the other phase on the base model.
+    """
+    env = os.environ if env is None else env
+    base = env.get("OLLAMA_MODEL", DEFAULT_MODEL)
+    return {
+        "map": env.get("OLLAMA_MAP_MODEL") or base,
+        "reduce": env.get("OLLAMA_REDUCE_MODEL") or base,
+        "fallback": env.get("OLLAMA_FALLBACK_MODEL") or None,
+    }
+
+
+class ModelSelector:
+    """Pick the Ollama models for the map (chunk summaries) and reduce phases.
+
+    Models form a ladder from largest to smallest: `reduce_model`,
+    `map_model`, `fallback_model`. Reduce and the final synthesis start on
+    the top rung, chunk summaries on the second, except for transcripts of
+    at most `short_tokens`, which are few calls and get the large model
+    throughout. When the scheduler has `overload` times its slots of work
+    (running plus queued), both phases step one rung down, and two rungs at
+    twice that.
+    """
+
+    def __init__(
+        self,
+        map_model: str,
+        reduce_model: str,
+        fallback_model: Optional[str] = None,
+        short_tokens: int = 5000,
+        overload: float = 2.0,
+    ):
+        self.ladder = []
+        for model in (reduce_model, map_model, fallback_model):
+            if model and model not in self.ladder:
+                self.ladder.append(model)
+        self.short_tokens = short_tokens
+        self.overload = overload
+
+    def pressure(self, load: dict) -> float:
+        """Scheduler work per slot; 1.0 means every slot busy and nothing waiting."""
+        return (load["running"] + load["queued"]) / max(1, load["max_concurrency"])
+
+    def select(self, transcript_tokens: Optional[int], load: dict) -> dict:
+        """{"map": model, "reduce": model} for a transcript of `transcript_tokens` (None if not known yet)."""
+        short = transcript_tokens is not None and transcript_tokens <= self.short_tokens
+        map_rung = 0 if short else 1
+        pressure = self.pressure(load)
+        step = 0
+        if self.overload > 0:
+            step = 2 if pressure >= 2 * self.overload else 1 if pressure >= self.overload else 0
+
+        def rung(i: int) -> str:
+            return self.ladder[min(i, len(self.ladder) - 1)]
+
+        models = {"map": rung(map_rung + step), "reduce": rung(step)}
+        if step:
+            logger.info(f"Ollama overloaded ({pressure:.1f} calls per slot): using {models}")
+        return models
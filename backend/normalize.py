@@ -0,0 +1,230 @@
+import re
+from collections import deque
+from typing import AsyncIterator, Optional
+
+try:
+    from .chunking import chars_per_token
+except ImportError:
+    from chunking import chars_per_token
+
+# Caption annotations: [Música], [Aplausos], [ __ ] (bleeped word), ♪ lyrics ♪
+_MARKER = (
+    r"\[[^\[\]\n]{0,40}\]"
+    r"|\((?:música|musica|music|aplausos|applause|risos|laughter|inaudível|inaudivel|inaudible)\)"
+    r"|[♪♫♬]+"
+)
+_MARKER_RE = re.compile(_MARKER, re.IGNORECASE)
+# A caption line holding nothing but markers goes away with its line break
+_MARKER_LINE_RE = re.compile(rf"^[ \t]*(?:(?:{_MARKER})[ \t]*)+(?:\n|$)", re.IGNORECASE | re.MULTILINE)
+# Hesitation sounds only; words like "né" or "tipo" can carry meaning and stay
+_FILLER_RE = re.compile(r"^(?:hã+|hum+|hm+|ahn*|ãh+|ã+|eh+|éh+|é{2,}|uhm*|erm*)$")
+_UNIT_RE = re.compile(r"(\S+)(\s*)")
+_KEY_STRIP_RE = re.compile(r"^\W+|\W+$")
+
+# Bump when the rules change: normalized transcripts are cached under it
+NORMALIZE_VERSION = "2"
+
+_GRAM = 2  # words per hashed n-gram: the shortest repeat that can be found
+_BASE = 1_000_003
+_MOD = (1 << 61) - 1
+
+
+def _key(word: str) -> str:
+    # Captions of the same words differ in case and punctuation between lines
+    return _KEY_STRIP_RE.sub("", word).casefold()
+
+
+def _space(space: str) -> str:
+    # Runs of spaces (left where markers were cut) become one; up to two line breaks are kept
+    return "\n" * min(2, space.count("\n")) or (" " if space else "")
+
+
+def _stronger(a: str, b: str) -> str:
+    """The whitespace that separates more: a line break beats a space, a space beats nothing."""
+    return b if (b.count("\n"), len(b)) > (a.count("\n"), len(a)) else a
+
+
+class TranscriptNormalizer:
+    """Strip caption noise from a transcript as it streams in.
+
+    Drops annotation markers ([Música], [Aplausos], ♪) and hesitation
+    fillers ("hã", "hum"), and collapses immediate repeats: a caption
+    line repeated whole at the start of the next (rolling auto-captions,
+    doubled lines), or a run of at least `min_repeat` words with a real
+    word in it (Whisper's repetition loops). Short runs of numbers or
+    one- and two-letter tokens within a line are left alone, as speech
+    repeats those ("1 2 1 2 3 4"). Repeats are found with a rolling hash
+    of word pairs, indexed over the most recent `window` words, so the
+    pass is linear in the transcript length. Line breaks are kept.
+
+    `feed()` returns the text that is final so far and `flush()` the rest.
+    Pieces are expected to end between words, as Whisper segments do.
+    """
+
+    def __init__(self, min_repeat: int = 3, window: int = 64):
+        self.n = _GRAM
+        self.min_repeat = max(_GRAM, min_repeat)
+        self.window = max(self.min_repeat, window)
+        self._pow = pow(_BASE, self.n, _MOD)
+        self._pending = []  # (key, word, space) not yet decided
+        self._out = deque()  # (key, word, space) of the last `window` kept words
+        self._out_start = 0  # absolute position of _out[0]
+        self._hashes = deque()  # rolling hash of the last n kept words: [h]
+        self._index = {}  # n-gram hash -> absolute start positions in the window
+        self._indexed = deque()  # (hash, position), oldest first, for expiry
+        self._hash = 0
+        self._carry = ""  # whitespace of the held-back last word
+        self.stats = {"chars_in": 0, "chars_out": 0, "markers": 0, "fillers": 0, "repeated_words": 0}
+
+    def feed(self, text: str) -> str:
+        self.stats["chars_in"] += len(text)
+        self.stats["markers"] += len(_MARKER_RE.findall(text))
+        text = _MARKER_RE.sub(" ", _MARKER_LINE_RE.sub("", text))
+        lead = text[:len(text) - len(text.lstrip())]
+        if lead:
+            self._absorb_space(_space(lead))
+        for m in _UNIT_RE.finditer(text):
+            word, space = m.group(1), _space(m.group(2))
+            if _FILLER_RE.match(_key(word)):
+                self.stats["fillers"] += 1
+                self._absorb_space(space)
+                continue
+            self._pending.append((_key(word), word, space))
+        return self._drain(final=False)
+
+    def flush(self) -> str:
+        return self._drain(final=True)
+
+    async def wrap(self, pieces: AsyncIterator[str]) -> AsyncIterator[str]:
+        """`pieces` normalized, e.g. Whisper segments on their way to the chunker."""
+        async for piece in pieces:
+            text = self.feed(piece)
+            if text:
+                yield text
+        text = self.flush()
+        if text:
+            yield text
+
+    def report(self, model: Optional[str] = None) -> dict:
+        """Characters and estimated tokens removed so far, for response metadata."""
+        saved = self.stats["chars_in"] - self.stats["chars_out"]
+        return {
+            "chars_before": self.stats["chars_in"],
+            "chars_after": self.stats["chars_out"],
+            "chars_saved": saved,
+            "tokens_saved": int(saved / chars_per_token(model)),
+            "markers_removed": self.stats["markers"],
+            "fillers_removed": self.stats["fillers"],
+            "repeated_words_removed": self.stats["repeated_words"],
+        }
+
+    def _absorb_space(self, space: str) -> None:
+        # A dropped word may have ended a line; keep the break on the word before it
+        if self._pending:
+            key, word, prev = self._pending[-1]
+            self._pending[-1] = (key, word, _stronger(prev, space))
+        elif self._out:
+            self._carry = _stronger(self._carry, space)
+
+    def _drain(self, final: bool) -> str:
+        emitted = []
+        i = 0
+        pending = self._pending
+        # A repeat can run up to `window` words; without that much lookahead, wait for more text
+        while i < len(pending) and (final or len(pending) - i > self.window):
+            skip = self._repeat_length(pending, i)
+            if skip:
+                self.stats["repeated_words"] += skip
+                self._carry = _stronger(self._carry, pending[i + skip - 1][2])
+                i += skip
+                continue
+            if self._out:
+                key, word, space = self._out[-1]
+                emitted.append(word + _stronger(space, self._carry))
+            self._append(pending[i])
+            i += 1
+        del pending[:i]
+
+        if final and self._out:
+            key, word, space = self._out[-1]
+            emitted.append(word + _stronger(space, self._carry))
+            self._reset_output()
+        text = "".join(emitted)
+        if final:
+            text = text.rstrip()
+        self.stats["chars_out"] += len(text)
+        return text
+
+    def _repeat_length(self, pending: list, i: int) -> int:
+        """Length of the run at pending[i] that repeats the words just kept, or 0."""
+        if len(pending) - i < self.n or len(self._out) < self.n:
+            return 0
+        h = 0
+        for key, _, _ in pending[i:i + self.n]:
+            h = (h * _BASE + hash(key)) % _MOD
+        end = self._out_start + len(self._out)
+        for q in self._index.get(h, ()):
+            length = end - q
+            if length > len(pending) - i:
+                continue
+            start = q - self._out_start
+            if not all(pending[i + k][0] == self._out[start + k][0] for k in range(length)):
+                continue
+            if self._whole_line(start) or (
+                length >= self.min_repeat
+                and any(len(key) >= 3 and not key.isdigit() for key, _, _ in pending[i:i + length])
+            ):
+                return length
+        return 0
+
+    def _whole_line(self, start: int) -> bool:
+        """Whether the kept words from _out[start] to the end make up one whole caption line."""
+        if start == 0:
+            starts_line = self._out_start == 0
+        else:
+            starts_line = "\n" in self._out[start - 1][2]
+        return starts_line and "\n" in _stronger(self._out[-1][2], self._carry)
+
+    def _append(self, unit: tuple) -> None:
+        if self._out:
+            key, word, space = self._out[-1]
+            self._out[-1] = (key, word, _stronger(space, self._carry))
+        self._carry = ""
+        self._out.append(unit)
+        pos = self._out_start + len(self._out) - 1
+
+        h = hash(unit[0])
+        self._hashes.append(h)
+        self._hash = (self._hash * _BASE + h) % _MOD
+        if len(self._hashes) > self.n:
+            self._hash = (self._hash - self._hashes.popleft() * self._pow) % _MOD
+        if len(self._hashes) == self.n:
+            start = pos - self.n + 1
+            self._index.setdefault(self._hash, []).append(start)
+            self._indexed.append((self._hash, start))
+
+        if len(self._out) > self.window:
+            self._out.popleft()
+            self._out_start += 1
+        while self._indexed and self._indexed[0][1] < self._out_start:
+            old, start = self._indexed.popleft()
+            starts = self._index[old]
+            starts.remove(start)
+            if not starts:
+                del self._index[old]
+
+    def _reset_output(self) -> None:
+        self._out.clear()
+        self._out_start = 0
+        self._hashes.clear()
+        self._index.clear()
+        self._indexed.clear()
+        self._hash = 0
+        self._carry = ""
+
+
+def normalize_transcript(text: str, model: Optional[str] = None, min_repeat: int = 3, window: int = 64) -> tuple:
+    """(normalized text, report) for a whole transcript; see `TranscriptNormalizer`."""
+    normalizer = TranscriptNormalizer(min_repeat=min_repeat, window=window)
+    normalized = normalizer.feed(text) + normalizer.flush()
+    return normalized, normalizer.report(model)
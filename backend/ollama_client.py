@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaError(Exception):
+    """Raised when Ollama is unreachable or keeps failing after all retries.
+
+    `status_code` is set when Ollama answered with an HTTP error.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_keep_alive(value: str):
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: seconds as a number, or a duration like "30m".
+
+    Empty means "use the server default" (None).
+    """
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class OllamaClient:
+    """Async Ollama client sharing one keep-alive connection pool.
+
+    Transport errors and 5xx responses are retried with exponential backoff;
+    4xx responses fail immediately. `keep_alive` is sent with every call so
+    Ollama keeps the model loaded between requests.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 600.0,
+        connect_timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 1.0,
+        max_connections: int = 16,
+        keep_alive=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def post_json(self, path: str, payload: dict, timeout: Optional[float] = None) -> dict:
+        """POST JSON to an Ollama endpoint, retrying transient failures."""
+        call_timeout = httpx.Timeout(timeout or self.timeout, connect=self.connect_timeout)
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self._http().post(path, json=payload, timeout=call_timeout)
+                if resp.status_code < 500:
+                    resp.raise_for_status()
+                    return resp.json()
+                last_error = OllamaError(f"HTTP {resp.status_code}: {resp.text[:200]}", resp.status_code)
+            except httpx.HTTPStatusError as e:
+                raise OllamaError(
+                    f"HTTP {e.response.status_code}: {e.response.text[:200]}", e.response.status_code
+                ) from e
+            except httpx.TransportError as e:
+                last_error = e
+
+            if attempt < self.retries:
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Ollama call to {path} failed ({last_error}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        logger.error(f"Ollama connection error: {last_error}")
+        if isinstance(last_error, OllamaError):
+            raise last_error
+        raise OllamaError(str(last_error)) from last_error
+
+    async def ping(self, timeout: float = 5.0) -> bool:
+        """True if Ollama answers /api/tags."""
+        try:
+            resp = await self._http().get("/api/tags", timeout=timeout)
+            return resp.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def _payload(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict],
+        system: Optional[str],
+        format: Optional[str],
+        stream: bool,
+    ) -> dict:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options or {"temperature": 0.2},
+        }
+        # Fixed instructions go in `system` so every call of a stage starts
+        # with the same prefix, which Ollama can keep evaluated between calls
+        if system:
+            payload["system"] = system
+        if format:
+            payload["format"] = format
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    async def warmup(self, model: str) -> bool:
+        """Load `model` into memory before the first real request."""
+        payload = {"model": model}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        start = time.perf_counter()
+        try:
+            # A generate call without a prompt only loads the model
+            await self.post_json("/api/generate", payload)
+        except OllamaError as e:
+            logger.warning(f"Warming up {model} on {self.base_url} failed: {e}")
+            return False
+        logger.info(f"Warmed up {model} on {self.base_url} in {time.perf_counter() - start:.1f}s")
+        return True
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> str:
+        """Call /api/generate and return the response text.
+
+        `format="json"` makes Ollama constrain the output to valid JSON.
+        """
+        start = time.perf_counter()
+        payload = self._payload(prompt, model, options, system, format, False)
+        out = await self.post_json("/api/generate", payload, timeout=timeout)
+        response = (out.get("response") or "").strip()
+        metrics.record_ollama_call(model, time.perf_counter() - start, prompt, response, out, system=system)
+        return response
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Call /api/generate with streaming on, yielding response fragments.
+
+        Connection failures are retried only until the first fragment has
+        been yielded; after that the error is raised to the caller.
+        """
+        payload = self._payload(prompt, model, options, system, format, True)
+        call_timeout = httpx.Timeout(timeout or self.timeout, connect=self.connect_timeout)
+        start = time.perf_counter()
+        received = []
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            started = False
+            try:
+                async with self._http().stream("POST", "/api/generate", json=payload, timeout=call_timeout) as resp:
+                    if resp.status_code >= 400:
+                        body = (await resp.aread()).decode("utf-8", "replace")
+                        raise OllamaError(f"HTTP {resp.status_code}: {body[:200]}", resp.status_code)
+                    async for line in resp.aiter_lines():
+                        if not line.strip():
+                            continue
+                        part = json.loads(line)
+                        if part.get("error"):
+                            raise OllamaError(part["error"])
+                        if part.get("response"):
+                            started = True
+                            received.append(part["response"])
+                            yield part["response"]
+                        if part.get("done"):
+                            metrics.record_ollama_call(
+                                model, time.perf_counter() - start, prompt, "".join(received), part, system=system
+                            )
+                            return
+                return
+            except httpx.TransportError as e:
+                if started:
+                    raise OllamaError(str(e)) from e
+                last_error = e
+
+            if attempt < self.retries:
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Ollama stream failed ({last_error}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        logger.error(f"Ollama connection error: {last_error}")
+        raise OllamaError(str(last_error)) from last_error
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Iterable, Optional
+
+try:
+    from .ollama_client import OllamaClient, OllamaError
+except ImportError:
+    from ollama_client import OllamaClient, OllamaError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_base_urls(value: str) -> list:
+    """Comma-separated Ollama URLs, without blanks or duplicates."""
+    urls = []
+    for url in value.split(","):
+        url = url.strip().rstrip("/")
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def _node_failed(error: OllamaError) -> bool:
+    """True if the error says the node is unwell rather than the request bad."""
+    return error.status_code is None or error.status_code >= 500
+
+
+class _Node:
+    def __init__(self, client: OllamaClient):
+        self.client = client
+        self.outstanding = 0
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+    def eject(self, seconds: float) -> None:
+        self.ejected_until = time.monotonic() + seconds
+
+
+class OllamaRouter:
+    """Spread Ollama calls over several backends.
+
+    Each call goes to the healthy backend with the fewest calls in flight.
+    A backend that fails with a connection error or 5xx is ejected for
+    `eject_seconds` and the call is retried on another one; a background
+    probe of /api/tags every `health_interval` seconds ejects and re-admits
+    backends between calls. Streams fail over only before the first
+    fragment. Same interface as OllamaClient.
+    """
+
+    def __init__(
+        self,
+        base_urls: Iterable[str],
+        retries: int = 2,
+        backoff: float = 1.0,
+        health_interval: float = 10.0,
+        eject_seconds: float = 30.0,
+        **client_options,
+    ):
+        base_urls = list(base_urls)
+        if not base_urls:
+            raise ValueError("At least one Ollama base URL is required")
+        # With a single backend there is nowhere to fail over to, so the
+        # client keeps its own retries; otherwise the router retries.
+        single = len(base_urls) == 1
+        self.nodes = [
+            _Node(OllamaClient(url, retries=retries if single else 0, backoff=backoff, **client_options))
+            for url in base_urls
+        ]
+        self.attempts = 1 if single else max(0, retries) + 1
+        self.backoff = backoff
+        self.health_interval = health_interval
+        self.eject_seconds = eject_seconds
+        self._next = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _pick(self, tried: set) -> _Node:
+        candidates = [n for n in self.nodes if n.healthy and n not in tried]
+        if not candidates:
+            candidates = [n for n in self.nodes if n not in tried] or self.nodes
+        # Least outstanding; rotate the starting point so ties spread out
+        self._next = (self._next + 1) % len(self.nodes)
+        order = self.nodes[self._next:] + self.nodes[:self._next]
+        return min(candidates, key=lambda n: (n.outstanding, order.index(n)))
+
+    def _failed(self, node: _Node, error: OllamaError) -> None:
+        if len(self.nodes) > 1 and _node_failed(error):
+            logger.warning(f"Ejecting Ollama backend {node.client.base_url} for {self.eject_seconds:.0f}s: {error}")
+            node.eject(self.eject_seconds)
+
+    async def _wait_before_retry(self, attempt: int, tried: set) -> None:
+        # Back off only once every backend has been tried
+        if len(tried) >= len(self.nodes):
+            tried.clear()
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> str:
+        tried: set = set()
+        for attempt in range(self.attempts):
+            node = self._pick(tried)
+            tried.add(node)
+            node.outstanding += 1
+            try:
+                return await node.client.generate(
+                    prompt, model, options=options, timeout=timeout, system=system, format=format
+                )
+            except OllamaError as e:
+                self._failed(node, e)
+                if not _node_failed(e) or attempt == self.attempts - 1:
+                    raise
+            finally:
+                node.outstanding -= 1
+            await self._wait_before_retry(attempt, tried)
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        tried: set = set()
+        for attempt in range(self.attempts):
+            node = self._pick(tried)
+            tried.add(node)
+            started = False
+            node.outstanding += 1
+            try:
+                async for token in node.client.generate_stream(
+                    prompt, model, options=options, timeout=timeout, system=system, format=format
+                ):
+                    started = True
+                    yield token
+                return
+            except OllamaError as e:
+                self._failed(node, e)
+                if started or not _node_failed(e) or attempt == self.attempts - 1:
+                    raise
+            finally:
+                node.outstanding -= 1
+            await self._wait_before_retry(attempt, tried)
+
+    async def warmup(self, model: str) -> None:
+        """Load `model` on every backend."""
+        await asyncio.gather(*[n.client.warmup(model) for n in self.nodes])
+
+    async def check_health(self) -> None:
+        """Probe every backend once, ejecting or re-admitting it."""
+        results = await asyncio.gather(*[n.client.ping() for n in self.nodes])
+        for node, ok in zip(self.nodes, results):
+            if ok:
+                if not node.healthy:
+                    logger.info(f"Ollama backend {node.client.base_url} is back")
+                node.ejected_until = 0.0
+            elif len(self.nodes) > 1:
+                if node.healthy:
+                    logger.warning(f"Ollama backend {node.client.base_url} failed its health check")
+                node.eject(self.eject_seconds)
+
+    async def _health_loop(self) -> None:
+        while True:
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Ollama health check failed: {e!r}")
+            await asyncio.sleep(self.health_interval)
+
+    def start(self) -> None:
+        """Start the periodic health probe (only useful with several backends)."""
+        if len(self.nodes) > 1 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    def status(self) -> list:
+        return [
+            {"url": n.client.base_url, "healthy": n.healthy, "outstanding": n.outstanding}
+            for n in self.nodes
+        ]
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for node in self.nodes:
+            await node.client.aclose()
@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+_tenant: contextvars.ContextVar = contextvars.ContextVar("ollama_tenant", default="default")
+_priority: contextvars.ContextVar = contextvars.ContextVar("ollama_priority", default=INTERACTIVE)
+
+
+class SchedulerFull(Exception):
+    """Raised when a tenant already has as many requests in progress as allowed."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def scheduling(tenant: str, priority: int = INTERACTIVE) -> Iterator[None]:
+    """Tag the Ollama calls made inside the block (and tasks started from it)."""
+    tenant_token = _tenant.set(tenant)
+    priority_token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(priority_token)
+        _tenant.reset(tenant_token)
+
+
+class OllamaScheduler:
+    """Admission control in front of an Ollama client or router.
+
+    Requests are admitted at the door: `admit()` reserves one of the
+    tenant's `max_requests_per_tenant` slots for a whole dossier, or raises
+    SchedulerFull, so a request that got in never fails halfway through
+    for lack of room. At most `max_concurrency` Ollama calls run at once;
+    the rest wait in per-tenant queues. Freed slots go to interactive
+    calls before batch ones, and round-robin between tenants of the same
+    priority so one tenant's backlog cannot starve the others.
+    Same interface as OllamaClient.
+    """
+
+    def __init__(self, client, max_concurrency: int = 8, max_requests_per_tenant: int = 8):
+        self.client = client
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_requests_per_tenant = max(1, max_requests_per_tenant)
+        self._requests = {}  # tenant -> admitted requests in progress
+        self._running = 0
+        # priority -> tenant -> waiting futures, tenants in round-robin order
+        self._waiting = {INTERACTIVE: OrderedDict(), BATCH: OrderedDict()}
+        self._avg_seconds = 10.0  # moving average of call time, for Retry-After
+
+    def queued(self, tenant: Optional[str] = None) -> int:
+        return sum(
+            len(q) for tenants in self._waiting.values() for t, q in tenants.items()
+            if tenant is None or t == tenant
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained."""
+        waves = (self.queued() + self._running) / self.max_concurrency
+        return max(1, math.ceil(waves * self._avg_seconds))
+
+    def admit(self, tenant: str) -> Callable[[], None]:
+        """Reserve a request slot for `tenant`, returning the function that frees it.
+
+        Raises SchedulerFull when the tenant already has
+        `max_requests_per_tenant` requests in progress.
+        """
+        if self._requests.get(tenant, 0) >= self.max_requests_per_tenant:
+            metrics.OLLAMA_REJECTED.inc()
+            raise SchedulerFull(
+                f"Too many requests in progress for tenant '{tenant}' ({self.max_requests_per_tenant})",
+                retry_after=self.retry_after(),
+            )
+        self._requests[tenant] = self._requests.get(tenant, 0) + 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self._requests[tenant] -= 1
+            if not self._requests[tenant]:
+                del self._requests[tenant]
+
+        return release
+
+    @contextmanager
+    def admitted(self, tenant: str) -> Iterator[None]:
+        """`admit()` for the duration of the block."""
+        release = self.admit(tenant)
+        try:
+            yield
+        finally:
+            release()
+
+    async def _acquire(self) -> None:
+        tenant, priority = _tenant.get(), _priority.get()
+        start = time.perf_counter()
+        if self._running < self.max_concurrency and not self.queued():
+            self._running += 1
+        else:
+            # Admission happened at the door: a call of an admitted request always waits its turn
+            future = asyncio.get_running_loop().create_future()
+            queue = self._waiting[priority].setdefault(tenant, deque())
+            queue.append(future)
+            try:
+                await future  # resolved by _release, which hands over its slot
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    queue.remove(future)
+                    if not queue and self._waiting[priority].get(tenant) is queue:
+                        del self._waiting[priority][tenant]
+                raise
+        metrics.OLLAMA_QUEUE_SECONDS.observe(time.perf_counter() - start, priority=PRIORITY_NAMES[priority])
+
+    def _release(self) -> None:
+        for priority in (INTERACTIVE, BATCH):
+            tenants = self._waiting[priority]
+            while tenants:
+                tenant, queue = next(iter(tenants.items()))
+                future = queue.popleft()
+                if queue:
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self._running -= 1
+
+    def _observe(self, seconds: float) -> None:
+        self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * seconds
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> str:
+        await self._acquire()
+        start = time.perf_counter()
+        try:
+            return await self.client.generate(
+                prompt, model, options=options, timeout=timeout, system=system, format=format
+            )
+        finally:
+            self._observe(time.perf_counter() - start)
+            self._release()
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        system: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        await self._acquire()
+        start = time.perf_counter()
+        try:
+            async for token in self.client.generate_stream(
+                prompt, model, options=options, timeout=timeout, system=system, format=format
+            ):
+                yield token
+        finally:
+            self._observe(time.perf_counter() - start)
+            self._release()
+
+    async def warmup(self, model: str) -> None:
+        # Not queued: it runs before traffic and only loads the model
+        await self.client.warmup(model)
+
+    def start(self) -> None:
+        self.client.start()
+
+    def status(self) -> list:
+        return self.client.status()
+
+    def load(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self.queued(),
+            "max_concurrency": self.max_concurrency,
+            "requests": sum(self._requests.values()),
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
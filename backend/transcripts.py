@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+try:
+    from .cache import TRANSCRIPTS
+except ImportError:
+    from cache import TRANSCRIPTS
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ["pt", "pt-BR", "pt-PT", "en"]
+
+# youtube_transcript_api errors meaning "this video has no usable captions";
+# anything else (network, rate limiting) may succeed on a later try
+_MISSING_ERRORS = ("NoTranscriptFound", "NoTranscriptAvailable", "TranscriptsDisabled", "VideoUnavailable")
+
+
+class TranscriptUnavailable(Exception):
+    """Raised when YouTube could not be asked (timeout, network, rate limit): not a "no captions" answer."""
+
+    def __init__(self, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+VIDEO_ID_RE = re.compile(r"(?:v=|\/)([0-9A-Za-z_-]{11})(?:\b|$)")
+
+def extract_video_id(url: str) -> str:
+    """Extract video_id from YouTube URL."""
+    m = VIDEO_ID_RE.search(url)
+    if not m:
+        raise ValueError("Could not extract video_id from link. Use standard YouTube URL.")
+    return m.group(1)
+
+def fetch_youtube_transcript(video_id: str) -> Optional[str]:
+    """Official transcript from YouTube, or None if the video has none.
+
+    Transient failures (network errors, rate limiting) are raised instead,
+    so callers can tell them apart from a definite "no captions".
+    """
+    try:
+        import youtube_transcript_api
+    except Exception:
+        logger.warning("youtube_transcript_api not installed")
+        return None
+
+    missing = tuple(
+        getattr(youtube_transcript_api, name) for name in _MISSING_ERRORS if hasattr(youtube_transcript_api, name)
+    )
+    try:
+        t = youtube_transcript_api.YouTubeTranscriptApi.get_transcript(video_id, languages=LANGUAGES)
+    except missing as e:
+        logger.info(f"No transcript found for {video_id}: {type(e).__name__}")
+        return None
+    return "\n".join([x["text"] for x in t]).strip() or None
+
+def try_youtube_transcript(video_id: str) -> Optional[str]:
+    """Try to fetch official transcript from YouTube."""
+    try:
+        return fetch_youtube_transcript(video_id)
+    except Exception as e:
+        logger.info(f"No transcript found for {video_id}: {e}")
+        return None
+
+
+class TranscriptProvider:
+    """Async, cached access to YouTube transcripts.
+
+    Fetches run on a dedicated pool of `workers` threads, so slow lookups
+    neither block the event loop nor take over the default executor. A
+    fetch only starts once a thread is free (callers, prefetches and
+    batches included, wait their turn before that) and `timeout` seconds
+    count from then. Found transcripts go to `cache`;
+    videos known to have no captions are remembered for `miss_ttl` seconds
+    and answered without a network call. A fetch that fails for another
+    reason is retried `retries` times, then raises TranscriptUnavailable
+    and is not remembered. Concurrent lookups of the same video share one
+    fetch.
+    """
+
+    def __init__(
+        self,
+        fetch=fetch_youtube_transcript,
+        cache=None,
+        workers: int = 8,
+        timeout: float = 20.0,
+        miss_ttl: float = 6 * 3600,
+        max_misses: int = 10000,
+        retries: int = 1,
+        retry_delay: float = 1.0,
+    ):
+        self.fetch = fetch
+        self.cache = cache
+        self.timeout = timeout
+        self.miss_ttl = miss_ttl
+        self.max_misses = max_misses
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="transcripts")
+        # One per thread, held until the thread is done, even with a fetch that timed out
+        self._threads = asyncio.Semaphore(max(1, workers))
+        self._misses: OrderedDict = OrderedDict()  # video_id -> expiry, oldest first
+        self._inflight: dict = {}
+        self._background: set = set()
+
+    def known_missing(self, video_id: str) -> bool:
+        expires = self._misses.get(video_id)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._misses[video_id]
+            return False
+        return True
+
+    def _remember_missing(self, video_id: str) -> None:
+        self._misses[video_id] = time.monotonic() + self.miss_ttl
+        self._misses.move_to_end(video_id)
+        while len(self._misses) > self.max_misses:
+            self._misses.popitem(last=False)
+
+    async def _run_fetch(self, video_id: str) -> Optional[str]:
+        """One fetch on a free thread, timed from when it starts."""
+        await self._threads.acquire()
+        loop = asyncio.get_running_loop()
+
+        def release(_) -> None:
+            try:
+                loop.call_soon_threadsafe(self._threads.release)
+            except RuntimeError:
+                pass  # loop already closed
+
+        future = self._executor.submit(self.fetch, video_id)
+        future.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    async def _fetch(self, video_id: str) -> Optional[str]:
+        for attempt in range(self.retries + 1):
+            try:
+                transcript = await self._run_fetch(video_id)
+                break
+            except asyncio.TimeoutError:
+                # The thread is still busy with it; another try would only queue behind
+                logger.warning(f"Transcript fetch for {video_id} timed out after {self.timeout:.0f}s")
+                raise TranscriptUnavailable(f"YouTube transcript fetch timed out after {self.timeout:.0f}s")
+            except Exception as e:
+                # Transient: not remembered, retried now and on the next request
+                logger.warning(f"Transcript fetch for {video_id} failed (attempt {attempt + 1}): {e!r}")
+                if attempt == self.retries:
+                    raise TranscriptUnavailable(f"YouTube transcript fetch failed: {type(e).__name__}")
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+        if transcript:
+            if self.cache:
+                self.cache.set(TRANSCRIPTS, f"yt:{video_id}", transcript)
+        else:
+            self._remember_missing(video_id)
+        return transcript
+
+    async def get(self, video_id: str) -> Optional[str]:
+        """Transcript of `video_id`, or None if it has none.
+
+        Raises TranscriptUnavailable when YouTube could not be asked.
+        """
+        transcript = self.cache.get(TRANSCRIPTS, f"yt:{video_id}") if self.cache else None
+        if transcript is not None:
+            return transcript
+        if self.known_missing(video_id):
+            return None
+        task = self._inflight.get(video_id)
+        if task is None:
+            task = self._inflight[video_id] = asyncio.ensure_future(self._fetch(video_id))
+            task.add_done_callback(lambda _: self._inflight.pop(video_id, None))
+        # Shielded: one caller giving up must not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def get_many(self, video_ids: Iterable[str]) -> dict:
+        """video_id -> transcript (or None, also when it could not be fetched), fetched in parallel."""
+        async def get_or_none(video_id: str) -> Optional[str]:
+            try:
+                return await self.get(video_id)
+            except TranscriptUnavailable:
+                return None
+
+        video_ids = list(dict.fromkeys(video_ids))
+        results = await asyncio.gather(*[get_or_none(v) for v in video_ids])
+        return dict(zip(video_ids, results))
+
+    def prefetch(self, video_ids: Iterable[str]) -> None:
+        """Start fetching in the background so later `get` calls find the result ready."""
+        task = asyncio.ensure_future(self.get_many(video_ids))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def shutdown(self) -> None:
+        for task in self._background:
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,99 @@
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledModel:
+    """A loaded Whisper model plus the guard that bounds concurrent use."""
+
+    def __init__(self, model, max_concurrency: int):
+        self.model = model
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.in_use = 0
+
+
+class WhisperModelPool:
+    """Process-wide registry of loaded Whisper models.
+
+    Each model variant is loaded once and shared across requests. At most
+    `max_concurrency` transcriptions run on the same model at a time, and when
+    more than `max_models` variants are resident the least recently used idle
+    one is dropped.
+    """
+
+    def __init__(self, max_models: int = 1, max_concurrency: int = 1):
+        self.max_models = max(1, max_models)
+        self.max_concurrency = max(1, max_concurrency)
+        self._models: "OrderedDict[str, _PooledModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict = {}
+
+    def _load(self, model_name: str) -> _PooledModel:
+        """Return the pooled model, loading it at most once per process."""
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is not None:
+                self._models.move_to_end(model_name)
+                return entry
+            load_lock = self._loading.setdefault(model_name, threading.Lock())
+
+        # Serialize loads of the same variant without blocking other variants.
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(model_name)
+                if entry is not None:
+                    self._models.move_to_end(model_name)
+                    return entry
+
+            import whisper
+
+            logger.info(f"Loading Whisper model '{model_name}'")
+            model = whisper.load_model(model_name)
+
+            with self._lock:
+                entry = _PooledModel(model, self.max_concurrency)
+                self._models[model_name] = entry
+                self._loading.pop(model_name, None)
+                self._evict_idle()
+                return entry
+
+    def _evict_idle(self) -> None:
+        """Drop least recently used idle models beyond `max_models`. Caller holds the lock."""
+        excess = len(self._models) - self.max_models
+        # Never drop the most recently used entry; it is about to be handed out.
+        for name in list(self._models)[:-1]:
+            if excess <= 0:
+                break
+            if self._models[name].in_use:
+                continue
+            logger.info(f"Evicting idle Whisper model '{name}'")
+            del self._models[name]
+            excess -= 1
+
+    def preload(self, model_names: Iterable[str]) -> None:
+        """Eagerly load the given variants (e.g. at startup)."""
+        for name in model_names:
+            self._load(name)
+
+    @contextmanager
+    def acquire(self, model_name: str) -> Iterator:
+        """Yield a shared model instance, waiting for a free concurrency slot."""
+        entry = self._load(model_name)
+        with self._lock:
+            entry.in_use += 1
+        try:
+            with entry.slots:
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                self._evict_idle()
+
+    def loaded(self) -> list:
+        """Names of the currently resident models, least recently used first."""
+        with self._lock:
+            return list(self._models)
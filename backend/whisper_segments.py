@@ -0,0 +1,240 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Optional
+
+import numpy as np
+
+try:
+    from . import metrics
+    from .audio import FRAME_SECONDS, SAMPLE_RATE, prepare_audio, to_float
+except ImportError:
+    import metrics
+    from audio import FRAME_SECONDS, SAMPLE_RATE, prepare_audio, to_float
+
+logger = logging.getLogger(__name__)
+
+SMOOTH_FRAMES = 10  # ~0.3s: look for a pause, not a single quiet frame
+
+
+def find_segments(
+    audio: np.ndarray,
+    segment_seconds: float = 300.0,
+    search_seconds: float = 30.0,
+    sr: int = SAMPLE_RATE,
+) -> list:
+    """Split audio into ~`segment_seconds` pieces cut at the quietest point.
+
+    Each cut is placed at the lowest-energy stretch within `search_seconds`
+    of the target length, so words are not split. Returns (start, end)
+    sample offsets covering the whole signal.
+    """
+    n = len(audio)
+    seg = int(segment_seconds * sr)
+    search = int(search_seconds * sr)
+    frame = int(FRAME_SECONDS * sr)
+    if seg <= 0 or n <= seg + search:
+        return [(0, n)]
+
+    cuts = [0]
+    while n - cuts[-1] > seg + search:
+        lo = cuts[-1] + seg - search
+        window = np.asarray(audio[lo:lo + 2 * search], dtype=np.float32)
+        frames = len(window) // frame
+        rms = np.sqrt(np.mean(window[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+        smooth = np.convolve(rms, np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES, mode="same")
+        cuts.append(lo + int(np.argmin(smooth)) * frame + frame // 2)
+    cuts.append(n)
+    return list(zip(cuts, cuts[1:]))
+
+
+def _shift(result: dict, offset: float) -> list:
+    """Whisper segments of one piece, with timestamps moved to file time."""
+    segments = []
+    for s in result.get("segments") or []:
+        text = (s.get("text") or "").strip()
+        if text:
+            segments.append({"start": round(s["start"] + offset, 2), "end": round(s["end"] + offset, 2), "text": text})
+    if not segments and (result.get("text") or "").strip():
+        segments.append({"start": round(offset, 2), "end": round(offset, 2), "text": result["text"].strip()})
+    return segments
+
+
+# Worker process state: each process loads a model variant once
+_worker_models: dict = {}
+
+
+def _worker_model(model_name: str):
+    model = _worker_models.get(model_name)
+    if model is None:
+        import whisper
+
+        model = _worker_models[model_name] = whisper.load_model(model_name)
+    return model
+
+
+def _init_worker(threads: int, model_names: tuple) -> None:
+    import torch
+
+    torch.set_num_threads(max(1, threads))
+    # Load while the process starts rather than on the first segment it gets
+    for name in model_names:
+        _worker_model(name)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _transcribe_in_worker(model_name: str, audio: np.ndarray, offset: float) -> list:
+    return _shift(_worker_model(model_name).transcribe(audio, fp16=False), offset)
+
+
+@functools.lru_cache(maxsize=1)
+def _has_cuda() -> bool:
+    try:
+        import torch
+
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+class SegmentedTranscriber:
+    """Transcribe long audio as silence-cut segments, in parallel on CPU hosts.
+
+    With more than one worker the segments go to a process pool, each
+    process holding its own copy of the model, loaded when the process
+    starts (`models`); otherwise (and on GPU hosts, where one model
+    already saturates the device) they run one after another on the
+    shared `model_pool`. Unless `workers` is set, it follows the pool's
+    `max_concurrency`, so by default only one model is loaded. Segments
+    are yielded in order as soon as each is done, with timestamps
+    relative to the whole file.
+
+    The file is first decoded once to 16 kHz mono PCM and pauses longer
+    than `min_silence` seconds are cut down to `keep_silence`, so Whisper
+    only spends time on speech; timestamps are mapped back to the original.
+    """
+
+    def __init__(
+        self,
+        model_pool,
+        workers: int = 0,
+        segment_seconds: float = 300.0,
+        min_silence: float = 1.0,
+        keep_silence: float = 0.3,
+        silence_db: float = -40.0,
+        models: tuple = (),
+    ):
+        self.model_pool = model_pool
+        self.workers = workers
+        self.models = tuple(models)
+        self.segment_seconds = segment_seconds
+        self.min_silence = min_silence
+        self.keep_silence = keep_silence
+        self.silence_db = silence_db
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _worker_count(self) -> int:
+        if self.workers > 0:
+            return self.workers
+        # Auto: as many model copies as transcriptions the pool allows, at
+        # most half the cores; in-process on GPU hosts
+        if _has_cuda():
+            return 1
+        return max(1, min(self.model_pool.max_concurrency, (os.cpu_count() or 1) // 2))
+
+    def _pool(self, workers: int) -> ProcessPoolExecutor:
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads, self.models),
+            )
+        return self._executor
+
+    def preload(self) -> None:
+        """Load `models` now: in every worker process, or in the shared pool when running in-process."""
+        workers = self._worker_count()
+        if workers <= 1:
+            self.model_pool.preload(self.models)
+            return
+        pool = self._pool(workers)
+        # Processes start on demand, one per submission while none is idle
+        for future in [pool.submit(_worker_ready) for _ in range(workers)]:
+            future.result()
+
+    def _transcribe_local(self, model_name: str, audio: np.ndarray, offset: float) -> list:
+        with self.model_pool.acquire(model_name) as model:
+            return _shift(model.transcribe(audio), offset)
+
+    async def iter_segments(self, audio_path: str, model_name: str) -> AsyncIterator[dict]:
+        """Yield {"start", "end", "text"} segments of the file in order."""
+        start_time = time.perf_counter()
+        prepared = await asyncio.to_thread(
+            prepare_audio, audio_path, self.min_silence, self.keep_silence, self.silence_db
+        )
+        metrics.record_stage("audio_prepare", time.perf_counter() - start_time)
+        metrics.AUDIO_SILENCE_REMOVED_SECONDS.inc(prepared.removed_seconds)
+        audio, time_map = prepared.samples, prepared.time_map
+        pieces = find_segments(audio, self.segment_seconds)
+        # May import torch to look for a GPU: not on the event loop
+        workers = await asyncio.to_thread(self._worker_count)
+        logger.info(f"Whisper: {prepared.seconds:.0f}s of audio in {len(pieces)} segments, {workers} workers")
+
+        def to_original(segments: list) -> list:
+            for s in segments:
+                s["start"], s["end"] = time_map.to_original(s["start"]), time_map.to_original(s["end"])
+            return segments
+
+        if workers <= 1 or len(pieces) == 1:
+            for start, end in pieces:
+                for segment in to_original(await asyncio.to_thread(
+                    self._transcribe_local, model_name, to_float(audio[start:end]), start / SAMPLE_RATE
+                )):
+                    yield segment
+            return
+
+        # Only `workers` segments are converted and in flight at a time, so
+        # the float32 copy of the whole file never exists at once
+        loop = asyncio.get_running_loop()
+        pool = self._pool(workers)
+        remaining = iter(pieces)
+        pending = deque()
+
+        def submit() -> None:
+            for start, end in remaining:
+                pending.append(loop.run_in_executor(
+                    pool, _transcribe_in_worker, model_name, to_float(audio[start:end]), start / SAMPLE_RATE
+                ))
+                return
+
+        try:
+            for _ in range(workers):
+                submit()
+            while pending:
+                segments = await pending[0]
+                pending.popleft()
+                submit()
+                for segment in to_original(segments):
+                    yield segment
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def transcribe(self, audio_path: str, model_name: str) -> str:
+        """The whole transcript, one line per Whisper segment."""
+        return "\n".join([s["text"] async for s in self.iter_segments(audio_path, model_name)])
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
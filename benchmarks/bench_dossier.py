@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+End-to-end /dossier benchmark against a fake Ollama and a stub transcriber.
+
+Runs the real FastAPI app in-process. Ollama is replaced by
+benchmarks/fake_ollama.py and the YouTube/Whisper transcribers return
+synthetic transcripts of the requested sizes, so runs are reproducible and
+need neither network, GPU nor docker.
+
+For every transcript size and concurrency level it records latency
+p50/p95/p99, throughput, Ollama calls and memory peaks, and writes
+everything as JSON. Pass --baseline with an older result file to fail on
+regressions.
+
+Uso:
+    python3 benchmarks/bench_dossier.py
+    python3 benchmarks/bench_dossier.py --sizes 20000,200000 --concurrency 1,4,16 --requests 16
+    python3 benchmarks/bench_dossier.py --source whisper --output results.json --baseline old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import start_fake_ollama  # noqa: E402
+
+API_TOKEN = "bench-token"
+
+VOCAB = (
+    "o governo anunciou ontem que a inflação de 2023 ficou abaixo da meta segundo o IBGE "
+    "o ministro Fernando Haddad disse que o Banco Central deve cortar juros em março "
+    "a empresa Petrobras apresentou resultados e os analistas esperam crescimento no setor "
+    "de acordo com a pesquisa os números mostram que a renda das famílias subiu no trimestre"
+).split()
+
+
+def synthetic_transcript(chars: int, seed: int) -> str:
+    """Caption-like Portuguese text of about `chars` characters."""
+    rng = random.Random(seed)
+    lines, size = [], 0
+    while size < chars:
+        words = [rng.choice(VOCAB) for _ in range(rng.randint(6, 14))]
+        line = " ".join(words)
+        if rng.random() < 0.3:
+            line += "."
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)[:chars]
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def install_stubs(api, transcripts: dict, source: str, whisper_seconds: float) -> None:
+    """Route the app's transcribers to the synthetic transcripts."""
+    def fake_youtube(video_id):
+        return transcripts.get(video_id) if source == "youtube" else None
+
+    async def fake_whisper_segments(audio_path, model_name="base"):
+        # The uploaded "audio" is just the video_id; its transcript comes
+        # out in 10 segments spread over `whisper_seconds`
+        with open(audio_path, encoding="utf-8") as f:
+            lines = transcripts[f.read().strip()].split("\n")
+        step = max(1, len(lines) // 10)
+        for i in range(0, len(lines), step):
+            await asyncio.sleep(whisper_seconds / 10)
+            yield {"start": float(i), "end": float(i + step), "text": "\n".join(lines[i:i + step])}
+
+    api.youtube.fetch = fake_youtube
+    api.iter_whisper_segments = fake_whisper_segments
+
+
+async def run_level(client, video_ids: list, concurrency: int, source: str) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(video_id: str):
+        nonlocal errors
+        data = {"url": f"https://youtu.be/{video_id}"}
+        files = {"audio": ("audio.mp3", video_id.encode(), "audio/mpeg")} if source == "whisper" else None
+        async with sem:
+            start = time.perf_counter()
+            resp = await client.post("/dossier", data=data, files=files,
+                                     headers={"Authorization": f"Bearer {API_TOKEN}"})
+            elapsed = time.perf_counter() - start
+        if resp.status_code == 200:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await asyncio.gather(*[one(v) for v in video_ids])
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+
+    return {
+        "requests": len(video_ids),
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 4) if wall else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 0.50), 4),
+            "p95": round(percentile(latencies, 0.95), 4),
+            "p99": round(percentile(latencies, 0.99), 4),
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "memory": {
+            "traced_peak_mb": round(peak / 2**20, 2),
+            "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        },
+    }
+
+
+async def run_benchmark(args, api, fake) -> list:
+    import httpx
+
+    results = []
+    transcripts = {}
+    install_stubs(api, transcripts, args.source, args.whisper_seconds)
+
+    async with httpx.AsyncClient(app=api.app, base_url="http://bench", timeout=None) as client:
+        # Warm up imports, connection pool and code paths
+        transcripts["warmup00000"] = synthetic_transcript(2000, seed=0)
+        await run_level(client, ["warmup00000"], 1, args.source)
+
+        for s, size in enumerate(args.sizes):
+            baseline_rps = None
+            for concurrency in args.concurrency:
+                # Fresh video ids (and so fresh transcripts) per level: nothing is shared
+                video_ids = [f"b{s:02d}{concurrency:03d}{i:05d}" for i in range(args.requests)]
+                for i, video_id in enumerate(video_ids):
+                    transcripts[video_id] = synthetic_transcript(size, seed=size * 1009 + concurrency * 101 + i)
+
+                calls_before = fake.calls
+                level = await run_level(client, video_ids, concurrency, args.source)
+                level.update({"transcript_chars": size, "concurrency": concurrency})
+                level["ollama_calls"] = fake.calls - calls_before
+                baseline_rps = baseline_rps or level["throughput_rps"]
+                level["scaling"] = round(level["throughput_rps"] / baseline_rps, 3) if baseline_rps else 0.0
+                results.append(level)
+
+                lat = level["latency_seconds"]
+                print(f"  {size:>8} chars  c={concurrency:<3} "
+                      f"p50={lat['p50']:.3f}s p95={lat['p95']:.3f}s p99={lat['p99']:.3f}s "
+                      f"{level['throughput_rps']:.2f} req/s  x{level['scaling']:.2f}  "
+                      f"peak={level['memory']['traced_peak_mb']}MB  errors={level['errors']}")
+
+                for video_id in video_ids:
+                    transcripts.pop(video_id, None)
+    await api.ollama.aclose()
+    return results
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """Levels whose p95 rose or throughput fell by more than `tolerance`."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["transcript_chars"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["transcript_chars"], r["concurrency"]))
+        if not old:
+            continue
+        key = f"{r['transcript_chars']} chars c={r['concurrency']}"
+        old_p95, new_p95 = old["latency_seconds"]["p95"], r["latency_seconds"]["p95"]
+        if old_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{key}: p95 {old_p95:.3f}s -> {new_p95:.3f}s")
+        old_rps, new_rps = old["throughput_rps"], r["throughput_rps"]
+        if old_rps and new_rps < old_rps * (1 - tolerance):
+            regressions.append(f"{key}: throughput {old_rps:.2f} -> {new_rps:.2f} req/s")
+    return regressions
+
+
+def int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark POST /dossier against a fake Ollama")
+    parser.add_argument("--sizes", type=int_list, default=[20000, 80000, 320000], help="transcript sizes in chars")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 4, 8], help="concurrent requests")
+    parser.add_argument("--requests", type=int, default=8, help="requests per size/concurrency level")
+    parser.add_argument("--source", choices=["youtube", "whisper"], default="youtube")
+    parser.add_argument("--whisper-seconds", type=float, default=5.0, help="stub Whisper time per upload, spread over 10 segments")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Ollama fixed seconds per call")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake Ollama generated tokens per second")
+    parser.add_argument("--prefill-tps", type=float, default=2000.0, help="fake Ollama prompt tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--max-parallel", type=int, default=4, help="fake Ollama parallel slots")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    server, fake, base_url = start_fake_ollama(
+        latency=args.latency, tps=args.tps, prefill_tps=args.prefill_tps,
+        response_tokens=args.response_tokens, max_parallel=args.max_parallel,
+    )
+
+    # The app reads its config at import time
+    os.environ["OLLAMA_BASE_URL"] = base_url
+    os.environ["API_TOKEN"] = API_TOKEN
+    os.environ["CACHE_ENABLED"] = "false"
+    os.environ["CASES_ENABLED"] = "false"
+    import logging
+    from backend import api
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"Benchmark /dossier ({args.source}) — fake Ollama em {base_url}")
+    tracemalloc.start()
+    try:
+        results = asyncio.run(run_benchmark(args, api, fake))
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+        },
+        "app_config": {
+            "OLLAMA_CONCURRENCY": api.OLLAMA_CONCURRENCY,
+            "CHUNK_TOKENS": api.CHUNK_TOKENS,
+            "CHUNK_OVERLAP_TOKENS": api.CHUNK_OVERLAP_TOKENS,
+            "REDUCE_TOKEN_BUDGET": api.REDUCE_TOKEN_BUDGET,
+            "REDUCE_FAN_IN": api.REDUCE_FAN_IN,
+            "OLLAMA_MAX_CONNECTIONS": api.OLLAMA_MAX_CONNECTIONS,
+            "OLLAMA_MAP_MODEL": api.OLLAMA_MAP_MODEL,
+            "OLLAMA_REDUCE_MODEL": api.OLLAMA_REDUCE_MODEL,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados salvos em {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("⛔ Regressões em relação ao baseline:")
+            for line in regressions:
+                print(f" - {line}")
+            sys.exit(1)
+        print("✅ Sem regressões em relação ao baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama server for benchmarks.
+
+Implements /api/tags and /api/generate (streaming and non-streaming) with a
+simple latency model:
+
+    call time = latency + prompt_tokens / prefill_tps + response_tokens / tps
+
+and at most `max_parallel` generations at once, like OLLAMA_NUM_PARALLEL.
+A `system` prompt already seen is not evaluated again (prefix reuse), and
+with `load_seconds` the first call after the model's keep_alive expired
+pays the load time. A call without a prompt only loads the model, and
+`format: json` returns a structured chunk summary.
+
+Uso:
+    python3 benchmarks/fake_ollama.py --port 11435 --tps 50
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["governo", "anunciou", "ontem", "que", "o", "IBGE", "revisou", "PIB", "em", "2,1%", "segundo", "ministro"]
+
+
+class FakeOllama:
+    def __init__(self, latency=0.05, tps=200.0, prefill_tps=2000.0, response_tokens=64, max_parallel=4,
+                 load_seconds=0.0):
+        self.latency = latency
+        self.load_seconds = load_seconds
+        self.loaded_until = 0.0
+        self.systems = set()
+        self.tps = tps
+        self.prefill_tps = prefill_tps
+        self.response_tokens = response_tokens
+        self.slots = threading.BoundedSemaphore(max_parallel)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def load(self, keep_alive) -> float:
+        """Seconds spent loading the model for this call."""
+        if isinstance(keep_alive, str):
+            units = {"s": 1, "m": 60, "h": 3600}
+            keep_alive = float(keep_alive[:-1]) * units.get(keep_alive[-1], 1) if keep_alive[-1] in units else float(keep_alive)
+        keep = 300.0 if keep_alive is None else float(keep_alive)
+        with self._lock:
+            now = time.monotonic()
+            seconds = 0.0 if now < self.loaded_until else self.load_seconds
+            self.loaded_until = float("inf") if keep < 0 else now + seconds + keep
+            return seconds
+
+    def stats(self, prompt: str, system: str = "") -> dict:
+        with self._lock:
+            cached = system in self.systems
+            self.systems.add(system)
+        prompt_tokens = max(1, (len(prompt) + (0 if cached else len(system))) // 4)
+        return {
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_tokens / self.prefill_tps * 1e9),
+            "eval_count": self.response_tokens,
+            "eval_duration": int(self.response_tokens / self.tps * 1e9),
+        }
+
+    def json_response(self) -> str:
+        words = [WORDS[i % len(WORDS)] for i in range(self.response_tokens)]
+        bullets = [" ".join(words[i:i + 8]) for i in range(0, len(words), 8)]
+        return json.dumps({
+            "bullets": bullets,
+            "people": ["Ministro da Fazenda"],
+            "organizations": ["IBGE"],
+            "claims": ["O IBGE revisou o PIB em 2,1%"],
+        }, ensure_ascii=False)
+
+    def tokens(self):
+        for i in range(self.response_tokens):
+            yield ("- " if i % 8 == 0 else "") + WORDS[i % len(WORDS)] + ("\n" if i % 8 == 7 else " ")
+
+
+def make_handler(fake: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, payload: dict, status: int = 200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def write_chunk(self, payload: dict):
+            line = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self.send_json({"models": [{"name": "mistral:latest"}]})
+            else:
+                self.send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_json({"error": "not found"}, status=404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            prompt = req.get("prompt", "")
+            load_seconds = fake.load(req.get("keep_alive"))
+            if not prompt:
+                time.sleep(load_seconds)
+                self.send_json({"model": req.get("model"), "response": "", "done": True,
+                                "load_duration": int(load_seconds * 1e9)})
+                return
+            stats = fake.stats(prompt, req.get("system") or "")
+            stats["load_duration"] = int(load_seconds * 1e9)
+            fake.count_call()
+
+            with fake.slots:
+                time.sleep(load_seconds + fake.latency + stats["prompt_eval_duration"] / 1e9)
+                if not req.get("stream", True):
+                    time.sleep(stats["eval_duration"] / 1e9)
+                    response = fake.json_response() if req.get("format") == "json" else "".join(fake.tokens())
+                    self.send_json({"model": req.get("model"), "response": response, "done": True, **stats})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                per_token = 1.0 / fake.tps
+                for token in fake.tokens():
+                    time.sleep(per_token)
+                    self.write_chunk({"model": req.get("model"), "response": token, "done": False})
+                self.write_chunk({"model": req.get("model"), "response": "", "done": True, **stats})
+                self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def start_fake_ollama(port: int = 0, **options):
+    """Start the fake server in a daemon thread. Returns (server, fake, base_url)."""
+    fake = FakeOllama(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed seconds per call")
+    parser.add_argument("--tps", type=float, default=200.0, help="generated tokens per second")
+    parser.add_argument("--prefill-tps", type=float, default=2000.0, help="prompt tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--max-parallel", type=int, default=4)
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="model load time after keep_alive expires")
+    args = parser.parse_args()
+
+    server, _, base_url = start_fake_ollama(
+        args.port, latency=args.latency, tps=args.tps, prefill_tps=args.prefill_tps,
+        response_tokens=args.response_tokens, max_parallel=args.max_parallel, load_seconds=args.load_seconds,
+    )
+    print(f"Fake Ollama ouvindo em {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
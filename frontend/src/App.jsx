@@ -5,6 +5,25 @@ import DossierForm from './components/DossierForm'
 import DossierResult from './components/DossierResult'
 import TokenPrompt from './components/TokenPrompt'
 
+const POLL_INTERVAL_MS = 2000
+
+const STAGE_LABELS = {
+  queued: 'Na fila...',
+  transcript: 'Buscando transcrição...',
+  transcribing: 'Transcrevendo áudio com Whisper...',
+  summarizing: 'Resumindo trechos com Ollama...',
+  reducing: 'Condensando notas...',
+  synthesizing: 'Gerando dossiê final...',
+}
+
+const describeJob = (job) => {
+  const label = STAGE_LABELS[job.stage] || 'Processando...'
+  const { chunks_done: done, chunks_total: total } = job.progress || {}
+  return total ? `${label} (${done}/${total})` : label
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
 function App() {
   const [apiToken, setApiToken] = useState('')
   const [apiBase, setApiBase] = useState('')
@@ -45,12 +64,13 @@ function App() {
         data.append('audio', formData.audio)
       }
 
-      const response = await axios.post(
-        `${apiBase}/dossier`,
+      const headers = { Authorization: `Bearer ${apiToken}` }
+      const submitted = await axios.post(
+        `${apiBase}/jobs`,
         data,
         {
           headers: {
-            Authorization: `Bearer ${apiToken}`,
+            ...headers,
             'Content-Type': 'multipart/form-data'
           },
           onUploadProgress: (progressEvent) => {
@@ -62,13 +82,23 @@ function App() {
         }
       )
 
-      setStatus('Analisando com Ollama...')
-      
+      // Poll the job until the pipeline finishes
+      const jobId = submitted.data.job_id
+      let job = submitted.data
+      while (job.status !== 'done' && job.status !== 'failed') {
+        setStatus(describeJob(job))
+        await sleep(POLL_INTERVAL_MS)
+        job = (await axios.get(`${apiBase}/jobs/${jobId}`, { headers })).data
+      }
+
+      const response = await axios.get(`${apiBase}/jobs/${jobId}/result`, { headers })
       setResult(response.data)
       setStatus('')
     } catch (err) {
       if (err.response?.status === 422) {
         setError(err.response.data.detail || 'Nenhuma transcrição encontrada. Envie um arquivo de áudio.')
+      } else if (err.response?.status === 429) {
+        setError('Servidor ocupado. Tente novamente em alguns instantes.')
       } else if (err.response?.status === 401) {
         setError('Token inválido. Verifique suas credenciais.')
         setApiToken('')
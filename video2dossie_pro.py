@@ -1,6 +1,15 @@
-import os, sys, time, re, json, textwrap, subprocess
-from urllib.request import Request, urlopen
-from urllib.error import URLError
+import os, sys, time, re, json, textwrap, subprocess, asyncio
+
+from backend.batch import read_urls, run_batch
+from backend.cache import DossierCache
+from backend.case_store import CaseStore
+from backend.dossier import generate_dossier
+from backend.fingerprint import ChunkIndex
+from backend.model_selection import configured_models
+from backend.normalize import normalize_transcript
+from backend.ollama_client import OllamaError, parse_keep_alive
+from backend.ollama_router import OllamaRouter, parse_base_urls
+from backend.transcripts import extract_video_id, try_youtube_transcript
 
 # Optional deps:
 # - youtube-transcript-api (recommended)
@@ -8,77 +17,146 @@ from urllib.error import URLError
 #
 # You already installed whisper; we'll try transcript first.
 
-VIDEO_ID_RE = re.compile(r"(?:v=|\/)([0-9A-Za-z_-]{11})(?:\b|$)")
-
-def extract_video_id(url: str) -> str:
-    m = VIDEO_ID_RE.search(url)
-    if not m:
-        raise ValueError("Não consegui extrair o video_id do link. Cole um link padrão do YouTube.")
-    return m.group(1)
-
 def safe_slug(s: str) -> str:
     s = re.sub(r"[^0-9A-Za-z_-]+", "_", s.strip())
     return s[:80] if s else "video"
 
-def http_post_json(url: str, payload: dict, timeout: int = 300) -> dict:
-    data = json.dumps(payload).encode("utf-8")
-    req = Request(url, data=data, headers={"Content-Type": "application/json"})
-    with urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-def ollama_generate(prompt: str, model: str, base_url: str) -> str:
-    # Ollama endpoint: POST /api/generate
-    out = http_post_json(f"{base_url.rstrip('/')}/api/generate", {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.2
-        }
-    }, timeout=600)
-    return (out.get("response") or "").strip()
-
-def chunk_text(text: str, max_chars: int = 9000) -> list[str]:
-    text = text.strip()
-    if len(text) <= max_chars:
-        return [text]
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + max_chars)
-        # try to break on sentence end
-        cut = text.rfind(".", start, end)
-        if cut == -1 or cut < start + int(max_chars * 0.6):
-            cut = end
-        else:
-            cut = cut + 1
-        chunks.append(text[start:cut].strip())
-        start = cut
-    return [c for c in chunks if c]
-
-def try_youtube_transcript(video_id: str) -> str | None:
-    try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-    except Exception:
-        return None
-
-    # Try Portuguese first, then English
-    langs = ["pt", "pt-BR", "pt-PT", "en"]
-    try:
-        t = YouTubeTranscriptApi.get_transcript(video_id, languages=langs)
-        return "\n".join([x["text"] for x in t]).strip()
-    except Exception:
-        return None
-
 def whisper_transcribe(audio_path: str, model_name: str = "base") -> str:
     import whisper
     model = whisper.load_model(model_name)
     result = model.transcribe(audio_path)
     return (result.get("text") or "").strip()
 
+def dossier_options() -> dict:
+    return {
+        "token_budget": int(os.environ.get("REDUCE_TOKEN_BUDGET", 6000)),
+        "fan_in": int(os.environ.get("REDUCE_FAN_IN", 4)),
+        "chunk_tokens": int(os.environ.get("CHUNK_TOKENS", 2500)),
+        "overlap_tokens": int(os.environ.get("CHUNK_OVERLAP_TOKENS", 100)),
+        # Resolved like the API: unset OLLAMA_REDUCE_MODEL means OLLAMA_MODEL, not the map model
+        "reduce_model": configured_models()["reduce"],
+    }
+
+def normalize_enabled() -> bool:
+    return os.environ.get("TRANSCRIPT_NORMALIZE", "true").lower() in ("1", "true", "yes")
+
+def cache_enabled() -> bool:
+    return os.environ.get("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def cases_enabled() -> bool:
+    return os.environ.get("CASES_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def open_cache():
+    # Same cache file and settings as the API, so CLI and API runs reuse each other's summaries
+    if not cache_enabled():
+        return None
+    return DossierCache(
+        os.environ.get("CACHE_PATH", ".cache/dossier_cache.sqlite3"),
+        ttl=float(os.environ.get("CACHE_TTL", 7 * 24 * 3600)),
+        max_bytes=int(os.environ.get("CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+    )
+
+def open_index() -> ChunkIndex:
+    # Same snapshot as the API, so a reupload seen by either reuses the other's summaries
+    return ChunkIndex(
+        os.environ.get("NEAR_DUP_PATH", ".cache/chunk_index.json"),
+        threshold=float(os.environ.get("NEAR_DUP_SIMILARITY", 0.85)),
+        max_entries=int(os.environ.get("NEAR_DUP_MAX_CHUNKS", 100000)),
+    )
+
+def near_dup_enabled() -> bool:
+    return os.environ.get("NEAR_DUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def open_cases():
+    # Same store as the API, so CLI runs show up in GET /cases and /cases/search
+    if not cases_enabled():
+        return None
+    return CaseStore(os.environ.get("CASES_PATH", ".cache/cases.sqlite3"))
+
+def ollama_router(base_url: str) -> OllamaRouter:
+    # OLLAMA_BASE_URLS=http://gpu1:11434,http://gpu2:11434 spreads the chunk summaries over several hosts
+    return OllamaRouter(
+        parse_base_urls(os.environ.get("OLLAMA_BASE_URLS", base_url)),
+        keep_alive=parse_keep_alive(os.environ.get("OLLAMA_KEEP_ALIVE", "30m")),
+    )
+
+async def build_dossier(transcript: str, model: str, base_url: str) -> dict:
+    client = ollama_router(base_url)
+    cache = open_cache()
+    # As in the API: near-duplicates reuse cached summaries, so no cache means no index
+    index = open_index() if near_dup_enabled() and cache is not None else None
+    try:
+        concurrency = int(os.environ.get("OLLAMA_CONCURRENCY", 4))
+        return await generate_dossier(
+            transcript, model=model, client=client, concurrency=concurrency, cache=cache, index=index,
+            **dossier_options(),
+        )
+    finally:
+        await client.aclose()
+        if cache is not None:
+            cache.close()
+        if index is not None:
+            index.save()
+
+async def build_batch(urls: list[str], out_root: str, model: str, base_url: str) -> dict:
+    client = ollama_router(base_url)
+    cache = open_cache()
+    cases = open_cases()
+    index = open_index() if near_dup_enabled() and cache is not None else None
+    try:
+        return await run_batch(
+            urls, client=client, model=model, out_root=out_root, cache=cache, cases=cases, index=index,
+            fetch_concurrency=int(os.environ.get("BATCH_FETCH_CONCURRENCY", 8)),
+            video_concurrency=int(os.environ.get("BATCH_VIDEO_CONCURRENCY", 2)),
+            ollama_concurrency=int(os.environ.get("OLLAMA_CONCURRENCY", 4)),
+            normalize=normalize_enabled(),
+            **dossier_options(),
+        )
+    finally:
+        await client.aclose()
+        if cache is not None:
+            cache.close()
+        if cases is not None:
+            cases.close()
+        if index is not None:
+            index.save()
+
+def main_batch():
+    # python3 video2dossie_pro.py --batch <arquivo_urls|-> [pasta_saida]
+    if len(sys.argv) < 3:
+        print("Uso: python3 video2dossie_pro.py --batch <arquivo_com_links|-> [pasta_saida]")
+        sys.exit(1)
+
+    source = sys.argv[2].strip()
+    out_root = sys.argv[3].strip() if len(sys.argv) >= 4 else "cases"
+    if source == "-":
+        urls = read_urls(sys.stdin)
+    else:
+        with open(source, encoding="utf-8") as f:
+            urls = read_urls(f)
+
+    base_url = os.environ.get("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+    models = configured_models()
+    model = models["map"]
+
+    print(f"📚 Lote: {len(urls)} links → {out_root}/<video_id>/")
+    print(f"🧠 Gerando dossiês com Ollama ({model} → {models['reduce']})…")
+    counts = asyncio.run(build_batch(urls, out_root=out_root, model=model, base_url=base_url))
+
+    print("✅ Lote finalizado:")
+    print(f" - gerados: {counts['done']}")
+    print(f" - já prontos (pulados): {counts['skipped']}")
+    print(f" - sem transcrição oficial: {counts['no_transcript']}")
+    print(f" - com erro: {counts['failed']}")
+    print(f"Progresso salvo em {out_root}/batch_manifest.json — rode de novo para retomar.")
+
 def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "--batch":
+        return main_batch()
+
     if len(sys.argv) < 2:
         print("Uso: python3 video2dossie_pro.py <LINK_YOUTUBE> [pasta_saida]")
+        print("     python3 video2dossie_pro.py --batch <arquivo_com_links|-> [pasta_saida]")
         sys.exit(1)
 
     url = sys.argv[1].strip()
@@ -94,10 +172,9 @@ def main():
 
     # 1) Try official transcript
     transcript = try_youtube_transcript(video_id)
+    source = "youtube" if transcript else "whisper"
     if transcript:
         print("✅ Transcrição oficial do YouTube encontrada.")
-        with open(transcript_path, "w", encoding="utf-8") as f:
-            f.write(transcript)
     else:
         print("⚠️ Não consegui pegar transcrição oficial.")
         print("➡️ Agora preciso que você SUBA um arquivo de áudio como:")
@@ -113,8 +190,6 @@ def main():
             if os.path.exists(audio_path) and os.path.getsize(audio_path) > 1024 * 100:
                 print("✅ audio.mp3 detectado. Transcrevendo com Whisper…")
                 transcript = whisper_transcribe(audio_path, model_name=os.environ.get("WHISPER_MODEL", "base"))
-                with open(transcript_path, "w", encoding="utf-8") as f:
-                    f.write(transcript)
                 break
             time.sleep(5)
             if i % 12 == 0:  # every 1 min
@@ -123,50 +198,24 @@ def main():
             print("⛔ Timeout esperando audio.mp3. Envie o arquivo e rode o script de novo.")
             sys.exit(2)
 
-    # 2) Build dossier using Ollama
     base_url = os.environ.get("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
-    model = os.environ.get("OLLAMA_MODEL", "mistral:latest")
-
-    print(f"🧠 Gerando dossiê com Ollama ({model})…")
-    chunks = chunk_text(transcript, max_chars=9000)
-
-    # First pass: summarize each chunk
-    chunk_summaries = []
-    for idx, c in enumerate(chunks, 1):
-        prompt = f"""Você é um analista investigativo. Resuma o TRECHO {idx}/{len(chunks)} abaixo em bullets curtos, mantendo fatos, nomes e números.
-TRECHO:
-{c}
-"""
-        try:
-            s = ollama_generate(prompt, model=model, base_url=base_url)
-        except URLError as e:
-            print("⛔ Erro chamando Ollama. Confirme se 'ollama serve' está rodando no Codespace.")
-            raise
-        chunk_summaries.append(s)
-
-    joined = "\n\n".join([f"### Trecho {i}\n{chunk_summaries[i-1]}" for i in range(1, len(chunk_summaries)+1)])
-
-    final_prompt = f"""Você é um jornalista investigativo e analista de inteligência.
-
-Com base nas notas por trecho abaixo, gere um DOSSIÊ do conteúdo.
-IMPORTANTE:
-- Se algo não estiver explícito nas notas, diga "não confirmado".
-- Referências externas: sugira temas/fontes para checar (ex: "site do IBGE", "paper sobre X"), mas deixe claro que são sugestões de verificação.
-- Seja objetivo, estruturado e útil para tomada de decisão.
-
-NOTAS:
-{joined}
-
-Gere exatamente com estas seções em Markdown:
-
-## 🧠 Resumo executivo (máx. 6 bullets)
-## 📌 Afirmações verificáveis (lista)
-## 🧍 Pessoas citadas (lista)
-## 🏢 Empresas/organizações citadas (lista)
-## 🧪 Vieses, exageros, lacunas (lista + 2 linhas explicando)
-## 📚 Pistas de checagem (fontes/termos para pesquisar)
-"""
-    dossier = ollama_generate(final_prompt, model=model, base_url=base_url)
+    models = configured_models()
+    model = models["map"]
+
+    # 2) Drop caption noise ([Música], "hã") and repeated caption lines
+    if normalize_enabled():
+        transcript, report = normalize_transcript(transcript, model)
+        print(f"🧹 Transcrição limpa: -{report['chars_saved']} caracteres (~{report['tokens_saved']} tokens)")
+    with open(transcript_path, "w", encoding="utf-8") as f:
+        f.write(transcript)
+
+    # 3) Build dossier using Ollama
+    print(f"🧠 Gerando dossiê com Ollama ({model} → {models['reduce']})…")
+    try:
+        result = asyncio.run(build_dossier(transcript, model=model, base_url=base_url))
+    except OllamaError:
+        print("⛔ Erro chamando Ollama. Confirme se 'ollama serve' está rodando no Codespace.")
+        raise
 
     md = f"""---
 type: video
@@ -177,7 +226,7 @@ generated_at: {time.strftime("%Y-%m-%d %H:%M:%S")}
 
 # 🎥 Dossiê do vídeo
 
-{dossier}
+{result["dossier"]}
 
 ---
 
@@ -188,10 +237,21 @@ generated_at: {time.strftime("%Y-%m-%d %H:%M:%S")}
 
     with open(dossier_path, "w", encoding="utf-8") as f:
         f.write(md)
+    entities_path = os.path.join(out_dir, "dossie.json")
+    with open(entities_path, "w", encoding="utf-8") as f:
+        json.dump({"entities": result["entities"], "claims": result["claims"]}, f, ensure_ascii=False, indent=2)
+    cases = open_cases()
+    if cases is not None:
+        try:
+            # Same as the API: the case is labelled with the model that wrote the dossier
+            cases.save(video_id, url, transcript, result, source=source, model=models["reduce"])
+        finally:
+            cases.close()
 
     print("✅ Pronto! Arquivos gerados:")
     print(" -", transcript_path)
     print(" -", dossier_path)
+    print(" -", entities_path)
     print("")
     print("👉 Agora é só abrir o dossie.md e colar no Obsidian.")
 